@@ -0,0 +1,7 @@
+"""
+Benchmarks of the conversion pipeline, run on synthetic notebooks.
+Run them with:
+python -m benchmarks run --output results.json
+and compare a later run with it:
+python -m benchmarks run --baseline results.json
+"""
@@ -0,0 +1,7 @@
+import fire
+
+from benchmarks.generate import write_notebooks
+from benchmarks.run import main
+
+if __name__ == "__main__":
+    fire.Fire({"run": main, "generate": write_notebooks})
@@ -0,0 +1,96 @@
+"""
+This file contains the generator of synthetic notebooks used by the benchmarks.
+The notebooks look like executed notebooks using obsidianize: code cells calling the obsidian_* functions with base64
+images in their outputs, text outputs, and markdown cells. Everything is generated from a seed, without network access.
+"""
+import base64
+import os
+import random
+
+DISPLAY_TYPES = ("pyplot", "plotly", "pandas")
+
+
+def generate_notebook(
+        cells: int = 100,
+        call_density: float = 0.3,
+        output_lines: int = 20,
+        image_bytes: int = 50_000,
+        markdown_ratio: float = 0.2,
+        seed: int = 0,
+):
+    """
+    Function to generate a synthetic executed notebook.
+    :param cells: int: the number of cells
+    :param call_density: float: the fraction of code cells calling an obsidian_* function (the cells with a call get
+    an image output)
+    :param output_lines: int: the number of lines of the text output of each code cell
+    :param image_bytes: int: the size of each embedded image, before base64 encoding
+    :param markdown_ratio: float: the fraction of markdown cells
+    :param seed: int: the seed of the generator
+    :return: NotebookNode: the notebook
+    """
+    from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook, new_output
+
+    rng = random.Random(seed)
+    notebook_cells = []
+    execution_count = 0
+    for index in range(cells):
+        if rng.random() < markdown_ratio:
+            notebook_cells.append(new_markdown_cell(
+                f"## Section {index}\n\nSome text explaining the next cells, with `code` and **emphasis**.\n"
+            ))
+            continue
+
+        execution_count += 1
+        source = [f"values_{index} = [x ** 2 for x in range({rng.randint(10, 1000)})]"]
+        outputs = [new_output(
+            "stream", name="stdout",
+            text="".join(f"line {line} of cell {index}: {rng.random():.6f}\n" for line in range(output_lines)),
+        )]
+        if rng.random() < call_density:
+            display_type = rng.choice(DISPLAY_TYPES)
+            source.append(f"obsidian_{display_type}(figure_{index}, \"Figure {index}\")")
+            image = rng.getrandbits(8 * image_bytes).to_bytes(image_bytes, "little")
+            image = base64.b64encode(image).decode("ascii")
+            outputs.append(new_output(
+                "display_data", data={"image/png": image, "text/plain": "<Figure size 640x480 with 1 Axes>"},
+            ))
+        notebook_cells.append(new_code_cell("\n".join(source), execution_count=execution_count, outputs=outputs))
+
+    return new_notebook(
+        cells=notebook_cells,
+        metadata={"kernelspec": {"name": "python3", "display_name": "Python 3", "language": "python"},
+                  "language_info": {"name": "python"}},
+    )
+
+
+def make_vault(folder: str) -> str:
+    """
+    Function to create an empty vault that is also a git repository, as the view handlers need both.
+    :param folder: str: the path to the folder
+    :return: str: the absolute path to the folder
+    """
+    folder = os.path.abspath(folder)
+    os.makedirs(os.path.join(folder, ".git"), exist_ok=True)
+    os.makedirs(os.path.join(folder, ".obsidian"), exist_ok=True)
+    return folder
+
+
+def write_notebooks(folder: str, count: int, **options) -> list:
+    """
+    Function to write synthetic notebooks to a folder.
+    :param folder: str: the path to the folder (created if needed)
+    :param count: int: the number of notebooks
+    :param options: the keyword arguments of generate_notebook (the seed is offset for each notebook)
+    :return: list: the paths to the notebooks
+    """
+    import nbformat
+
+    os.makedirs(folder, exist_ok=True)
+    seed = options.pop("seed", 0)
+    paths = []
+    for index in range(count):
+        path = os.path.join(folder, f"notebook_{index}.ipynb")
+        nbformat.write(generate_notebook(seed=seed + index, **options), path)
+        paths.append(path)
+    return paths
@@ -0,0 +1,223 @@
+"""
+This file contains the benchmarks of the conversion pipeline.
+Each stage of the conversion of one notebook (reading with each loader, nbconvert export,
+formatting with the view handlers, native rendering, native rendering with one cell changed since the previous
+rendering, saving) is timed separately, then the end-to-end conversion of one
+notebook and of a folder of notebooks.
+The timings are taken without tracing, the peak memory of each benchmark is measured in a separate, traced run.
+"""
+import copy
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.generate import make_vault, write_notebooks
+
+
+def _measure(function, repeat: int, setup=None) -> dict:
+    """
+    Function to time a benchmark, then measure its peak memory.
+    :param function: callable: the benchmark, called without arguments
+    :param repeat: int: the number of timed runs
+    :param setup: callable: function called before each run, outside of the timings
+    :return: dict: the median, minimum and maximum durations in seconds, and the peak memory in bytes
+    """
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "median": statistics.median(durations),
+        "min": min(durations),
+        "max": max(durations),
+        "peak_bytes": peak,
+    }
+
+
+def run_benchmarks(
+        cells: int = 200,
+        call_density: float = 0.3,
+        output_lines: int = 20,
+        image_bytes: int = 50_000,
+        notebooks: int = 8,
+        jobs: int = 1,
+        repeat: int = 5,
+        workdir: str = None,
+) -> dict:
+    """
+    Function to run the benchmarks.
+    :param cells: int: the number of cells of each synthetic notebook
+    :param call_density: float: the fraction of code cells calling an obsidian_* function
+    :param output_lines: int: the number of lines of the text output of each code cell
+    :param image_bytes: int: the size of each embedded image
+    :param notebooks: int: the number of notebooks of the folder benchmarks
+    :param jobs: int: the number of worker processes of the folder benchmarks
+    :param repeat: int: the number of timed runs of each benchmark
+    :param workdir: str: the folder to generate the notebooks in (a temporary folder, removed afterwards, by default)
+    :return: dict: the results, with the parameters and the environment
+    """
+    import nbformat
+
+    from obsidianize import __version__
+    from obsidianize.scripts.convert import convert_notebook_to_md, convert_notebooks_to_md
+    from obsidianize.src.utils.calls import clear_call_cache
+    from obsidianize.src.utils.format_md import format_markdown
+    from obsidianize.src.utils.load_nb import load_notebook
+    from obsidianize.src.utils.native_md import render_markdown
+    from obsidianize.src.utils.render_cache import get_render_cache
+    from obsidianize.src.utils.save_md import save_markdown
+    from obsidianize.src.utils.to_markdown import convert_to_markdown, get_markdown_exporter
+
+    parameters = {
+        "cells": cells, "call_density": call_density, "output_lines": output_lines, "image_bytes": image_bytes,
+        "notebooks": notebooks, "jobs": jobs, "repeat": repeat,
+    }
+    temporary = workdir is None
+    workdir = make_vault(tempfile.mkdtemp(prefix="obsidianize-bench-") if temporary else workdir)
+    try:
+        options = {"cells": cells, "call_density": call_density, "output_lines": output_lines,
+                   "image_bytes": image_bytes}
+        single_path = write_notebooks(os.path.join(workdir, "single"), 1, **options)[0]
+        folder = os.path.join(workdir, "folder")
+        write_notebooks(folder, notebooks, **options)
+
+        # Build the exporter once, as the CLI and the daemon do
+        get_markdown_exporter()
+        notebook = nbformat.read(single_path, as_version=4)
+        markdown = convert_to_markdown(notebook)
+        formatted = format_markdown(markdown, single_path)
+        markdown_path = single_path.replace(".ipynb", ".md")
+
+        def read():
+            with open(single_path, "r") as f:
+                nbformat.read(f, as_version=4)
+
+        # The other cells of the notebook are in the render cache, only the edited one is rendered again
+        render_cache = get_render_cache(workdir)
+        edited = copy.deepcopy(notebook)
+        edited_cell = edited.cells[len(edited.cells) // 2]
+        edited_source = edited_cell.source
+        render_markdown(edited, single_path, cache=render_cache)
+        edits = itertools.count()
+
+        def edit_cell():
+            edited_cell.source = f"{edited_source}\n# edit {next(edits)}"
+            clear_call_cache()
+
+        def remove_markdown():
+            if os.path.exists(markdown_path):
+                os.remove(markdown_path)
+
+        benchmarks = {
+            "read": (read, None),
+            "read_fast": (lambda: load_notebook(single_path, "fast"), None),
+            "read_stream": (lambda: load_notebook(single_path, "stream"), None),
+            "export": (lambda: convert_to_markdown(notebook), None),
+            "format": (lambda: format_markdown(markdown, single_path), clear_call_cache),
+            "native": (lambda: render_markdown(notebook, single_path), clear_call_cache),
+            "native_cached": (lambda: render_markdown(edited, single_path, cache=render_cache), edit_cell),
+            "save": (lambda: save_markdown(formatted, single_path), remove_markdown),
+            "notebook_nbconvert": (lambda: convert_notebook_to_md(single_path), remove_markdown),
+            # Without the render cache, so that every run renders all the cells (see native_cached)
+            "notebook_native": (lambda: convert_notebook_to_md(single_path, engine="native", render_cache=False),
+                                remove_markdown),
+            "folder_nbconvert": (lambda: convert_notebooks_to_md([folder], force=True, jobs=jobs), None),
+            "folder_native": (lambda: convert_notebooks_to_md([folder], force=True, jobs=jobs, engine="native",
+                                                              render_cache=False), None),
+        }
+        results = {}
+        for name, (function, setup) in benchmarks.items():
+            results[name] = _measure(function, repeat, setup)
+            if name.startswith("folder_"):
+                results[name]["notebooks_per_second"] = notebooks / results[name]["median"]
+            print(f"{name:<20} {results[name]['median'] * 1000:10.2f} ms  {results[name]['peak_bytes'] / 1e6:8.1f} MB")
+    finally:
+        if temporary:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "environment": {
+            "obsidianize": __version__,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "parameters": parameters,
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.1) -> list:
+    """
+    Function to compare benchmark results with a baseline, and print the comparison.
+    :param results: dict: the results, as returned by run_benchmarks
+    :param baseline: dict: the baseline results
+    :param threshold: float: the relative slowdown above which a benchmark is reported as a regression
+    :return: list: the names of the benchmarks that regressed
+    """
+    if results["parameters"] != baseline["parameters"]:
+        print("Warning: the baseline was run with other parameters")
+    regressions = []
+    for name, result in results["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        # The fastest runs are the least affected by the noise of the machine
+        ratio = result["min"] / reference["min"]
+        memory_ratio = result["peak_bytes"] / max(reference["peak_bytes"], 1)
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  slower"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"{name:<20} x{ratio:5.2f} time  x{memory_ratio:5.2f} memory{flag}")
+    return regressions
+
+
+def main(
+        output: str = None,
+        baseline: str = None,
+        threshold: float = 0.1,
+        **options,
+):
+    """
+    Function to run the benchmarks from the command line.
+    :param output: str: the JSON file to save the results to
+    :param baseline: str: a JSON file of previous results to compare with
+    :param threshold: float: the relative slowdown above which a benchmark is reported as a regression (0.1 by default)
+    :param options: the keyword arguments of run_benchmarks (cells, call_density, output_lines, image_bytes,
+    notebooks, jobs, repeat, workdir)
+    :return: nothing (exits with status 1 if a benchmark regressed)
+    """
+    results = run_benchmarks(**options)
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results saved to {output}")
+    if baseline is not None:
+        with open(baseline, "r") as f:
+            regressions = compare(results, json.load(f), threshold=threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than the baseline: {', '.join(regressions)}")
+            sys.exit(1)
@@ -1,5 +1,38 @@
 # Import the modules intended for public use
+# The placeholder functions are loaded lazily (PEP 562) so that importing the package, e.g. from the CLI, does not
+# import matplotlib, plotly, pandas and IPython.
 
-from obsidianize.src.placeholder_fun.obsidian import obsidian_plotly, obsidian_pyplot, obsidian_pandas
+import importlib
 
-__all__ = ['obsidian_plotly', 'obsidian_pyplot', 'obsidian_pandas']
\ No newline at end of file
+__version__ = '1.0.0'
+
+_LAZY_ATTRIBUTES = {
+    'obsidian_plotly': 'obsidianize.src.placeholder_fun.obsidian',
+    'obsidian_pyplot': 'obsidianize.src.placeholder_fun.obsidian',
+    'obsidian_pandas': 'obsidianize.src.placeholder_fun.obsidian',
+    'set_async_export': 'obsidianize.src.placeholder_fun.export_queue',
+    'flush': 'obsidianize.src.placeholder_fun.export_queue',
+    'get_plotly_timings': 'obsidianize.src.placeholder_fun.plotly_export',
+    'get_placeholder_overhead': 'obsidianize.src.placeholder_fun.obsidian',
+    'get_export_stats': 'obsidianize.src.placeholder_fun.obsidian',
+    'reset_notebook_path': 'obsidianize.src.utils.path_utils',
+    'convert_notebook': 'obsidianize.api',
+    'iter_convert_notebooks': 'obsidianize.api',
+}
+
+__all__ = ['obsidian_plotly', 'obsidian_pyplot', 'obsidian_pandas', 'set_async_export', 'flush',
+           'get_plotly_timings', 'get_placeholder_overhead', 'get_export_stats', 'reset_notebook_path',
+           'convert_notebook', 'iter_convert_notebooks']
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+        # Cache the attribute so that __getattr__ is only called once per name
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
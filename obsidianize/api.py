@@ -0,0 +1,83 @@
+"""
+This file contains the in-memory API of obsidianize, to convert notebooks that are not (or not yet) on disk, e.g. in a
+service receiving them as bytes.
+The layout of the repository (its root, the root of the vault, and the path of the notebook in the repository) is given
+explicitly instead of being looked up on disk, and nothing is written: the markdown and the list of the assets it
+embeds are returned. The assets themselves are exported by the obsidian_* functions when the notebook is run.
+"""
+import os
+from collections import namedtuple
+
+from obsidianize.scripts.convert import ENGINES, render_notebook
+from obsidianize.src.utils.context import ConversionContext
+from obsidianize.src.utils.load_nb import parse_notebook
+
+ConversionResult = namedtuple("ConversionResult", ["notebook_path", "markdown", "embeds"])
+Embed = namedtuple("Embed", ["display_type", "title", "link"])
+
+
+def convert_notebook(
+        notebook,
+        notebook_path: str,
+        repo_root: str,
+        vault_root: str = None,
+        assets_files=(),
+        engine: str = "native",
+        validate: bool = False,
+) -> ConversionResult:
+    """
+    Function to convert a notebook to Obsidian markdown in memory, without reading or writing any file.
+    :param notebook: NotebookNode, dict, bytes, str or file object: the notebook, its JSON dictionary, its JSON text,
+    or a file object to read it from
+    :param notebook_path: str: the path of the notebook in the repository (relative to repo_root, or absolute), which
+    decides the assets folder the embeds point to
+    :param repo_root: str: the root of the git repository
+    :param vault_root: str: the root of the Obsidian vault, which contains the repository (repo_root by default)
+    :param assets_files: iterable of str: the names of the files in the assets folder of the notebook (used to link the
+    full data of the large DataFrames)
+    :param engine: str: the conversion engine, "native" (default) or "nbconvert", see convert_notebook_to_md
+    :param validate: bool: validate the notebook against the nbformat schema
+    :return: ConversionResult: the path of the notebook, the markdown string, and the list of Embed (display type,
+    title, link relative to the vault) of the assets it embeds
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine should be one of {', '.join(ENGINES)}")
+    repo_root = os.path.abspath(repo_root)
+    vault_root = repo_root if vault_root is None else os.path.abspath(vault_root)
+    if os.path.commonpath([repo_root, vault_root]) != vault_root:
+        raise ValueError("the repository should be inside the vault")
+    notebook_path = os.path.normpath(os.path.join(repo_root, notebook_path))
+    if os.path.commonpath([repo_root, notebook_path]) != repo_root:
+        raise ValueError("the notebook should be inside the repository")
+
+    notebook = parse_notebook(notebook, validate=validate, name=notebook_path)
+    # Explicit layout: the paths are not looked up, the assets folder is not listed or created
+    context = ConversionContext(notebook_path, create_dirs=False, repo_root=repo_root, vault_root=vault_root,
+                                assets_files=assets_files)
+    embeds = []
+    markdown = render_notebook(notebook, notebook_path, engine, context, embeds=embeds)
+    return ConversionResult(notebook_path, markdown, [Embed(*embed) for embed in embeds])
+
+
+def iter_convert_notebooks(
+        notebooks,
+        repo_root: str,
+        vault_root: str = None,
+        engine: str = "native",
+        validate: bool = False,
+):
+    """
+    Function to convert notebooks to Obsidian markdown in memory, lazily: each notebook is only read when the previous
+    result has been consumed, so that the memory used does not grow with the number of notebooks.
+    :param notebooks: iterable of (notebook, notebook_path) or (notebook, notebook_path, assets_files) tuples, see
+    convert_notebook
+    :param repo_root: str: the root of the git repository
+    :param vault_root: str: the root of the Obsidian vault, which contains the repository (repo_root by default)
+    :param engine: str: the conversion engine, "native" (default) or "nbconvert"
+    :param validate: bool: validate the notebooks against the nbformat schema
+    :return: generator of ConversionResult: the results, in the order of the notebooks
+    """
+    for item in notebooks:
+        notebook, notebook_path, *assets_files = item
+        yield convert_notebook(notebook, notebook_path, repo_root, vault_root=vault_root,
+                               assets_files=assets_files[0] if assets_files else (), engine=engine, validate=validate)
@@ -4,7 +4,17 @@ import sys
 
 import fire
 
-from obsidianize.scripts.convert import convert_all_notebooks_to_md, convert_notebook_to_md
+from obsidianize.scripts.convert import (ENGINES, convert_notebook_to_md, convert_notebooks_to_md,
+                                        read_paths_from_stdin)
+from obsidianize.scripts.watch import watch
+from obsidianize.scripts.daemon import get_socket_path, request_daemon, serve
+from obsidianize.scripts.gc import collect_garbage
+from obsidianize.scripts.git_changes import get_notebook_changes, apply_notebook_changes
+from obsidianize.src.utils.manifest import get_cache_folder
+from obsidianize.src.utils.path_utils import find_ancestor_with
+from obsidianize.src.utils.profiling import print_profiles, save_profiles
+from obsidianize.src.utils.report import ConversionReport
+from obsidianize.src.utils.to_markdown import get_markdown_exporter
 from obsidianize.scripts.setup import setup_git_hooks, setup_git_ignore_md, setup_git_ignore_assets
 
 
@@ -42,55 +52,248 @@ class Obsidianize:
 
     def convert(
             self,
-            path: str = "./"
+            *paths: str,
+            stdin: bool = False,
+            timings: bool = False,
+            force: bool = False,
+            jobs: int = None,
+            engine: str = "nbconvert",
+            loader: str = "auto",
+            validate: bool = False,
+            render_cache: bool = True,
+            include: str = "*.ipynb",
+            exclude=(),
+            gitignore: bool = True,
+            recursive: bool = True,
+            daemon: bool = True,
+            profile: bool = False,
+            profile_dump: bool = False,
     ):
         """
-        This function converts a jupyter notebook, or a folder of jupyter notebooks to a markdown file.
-        :param path: str: path to the file to convert
-        :return: nothing (will convert the file in place)
+        This function converts jupyter notebooks, or folders of jupyter notebooks, to markdown files.
+        :param paths: str: paths to the files or folders to convert ("./" if none is given)
+        :param stdin: bool: also read NUL-separated paths from the standard input (False by default)
+        :param timings: bool: print the total and per-notebook conversion timings (False by default)
+        :param force: bool: convert the notebooks even if they did not change since their last conversion (False by
+        default)
+        :param jobs: int: number of worker processes converting notebooks in parallel (number of cores by default)
+        :param engine: str: conversion engine, "nbconvert" (default) or "native" (renders the cells directly, much
+        faster, same result)
+        :param loader: str: notebook loader, "nbformat" (nbformat.read), "fast" (parses the notebook with orjson when it
+        is installed, without validating it), "stream" (parses the notebook chunk by chunk and skips the outputs that
+        never reach the markdown file: images, text outputs, tracebacks) or "auto" (default, streams the notebooks
+        larger than 32 MB, fast for the others)
+        :param validate: bool: validate every notebook against the nbformat schema (by default only the notebooks
+        converted for the first time are validated by the fast and stream loaders) (False by default)
+        :param render_cache: bool: with the native engine, only render the cells that changed since their last
+        conversion, the rendered cells are cached in .git/obsidianize/render_cache.sqlite (True by default)
+        :param include: str: glob of the notebooks to convert in the folders, matched on their name, or on their path
+        relative to the folder if it contains a / ("*.ipynb" by default)
+        :param exclude: str: comma-separated .gitignore-style patterns of the paths to skip in the folders (e.g.
+        --exclude "drafts/,*.tmp.ipynb")
+        :param gitignore: bool: also skip the paths ignored by the .gitignore files of the folders (True by default)
+        :param recursive: bool: also convert the notebooks of the subfolders of the folders (True by default; .git,
+        assets, virtual environments, node_modules... are never searched)
+        :param daemon: bool: send the conversions to the daemon of the repository if one is running (see serve)
+        (True by default)
+        :param profile: bool: print the wall time, CPU time and net allocated memory blocks of each conversion stage
+        (load, paths, export, format, render, save) for each notebook, and save them as JSON in
+        .git/obsidianize/profile.json (the conversions are then done in process, not by the daemon) (False by default)
+        :param profile_dump: bool: with profile, also convert the slowest notebook again under cProfile and save the
+        statistics to .git/obsidianize/profile.prof (False by default)
+        :return: nothing (will convert the files in place)
         """
-        # Check if the path is a file
-        if os.path.isfile(path):
+        paths = _collect_paths(paths, stdin)
+        for path in paths:
+            # Check if the path is a file
+            if os.path.isfile(path):
+                # Check if the file is a jupyter notebook
+                if not path.endswith(".ipynb"):
+                    raise ValueError("This file is not a jupyter notebook")
+            # Check if the path is a directory
+            elif not os.path.isdir(path):
+                raise ValueError("path should lead to a .ipynb file or a folder")
 
-            # Check if the file is a jupyter notebook
-            if path.endswith(".ipynb"):
-                convert_notebook_to_md(path)
-            else:
-                raise ValueError("This file is not a jupyter notebook")
+        report = _run_conversions(paths, force=force, jobs=jobs, engine=engine, loader=loader,
+                                  validate=validate, render_cache=render_cache, daemon=daemon and not profile,
+                                  profile=profile,
+                                  discovery=dict(include=include, exclude=exclude, gitignore=gitignore,
+                                                 recursive=recursive))
+        report.print_summary(timings=timings)
+        if profile:
+            _report_profile(report, engine=engine, loader=loader, render_cache=render_cache, dump=profile_dump)
+
+        for path in paths:
+            # Make the path absolute
+            path = os.path.abspath(path)
+            print(f"{path} converted to markdown")
+        if report.failed:
+            sys.exit(1)
 
-        # Check if the path is a directory
-        elif os.path.isdir(path):
-            convert_all_notebooks_to_md(path)
+    def refresh(
+            self,
+            *paths: str,
+            stdin: bool = False,
+            timings: bool = False,
+            force: bool = False,
+            jobs: int = None,
+            engine: str = "nbconvert",
+            loader: str = "auto",
+            validate: bool = False,
+            render_cache: bool = True,
+            include: str = "*.ipynb",
+            exclude=(),
+            gitignore: bool = True,
+            recursive: bool = True,
+            daemon: bool = True,
+            profile: bool = False,
+            profile_dump: bool = False,
+            since: str = None,
+            staged: bool = False,
+    ):
+        """
+        This function refreshes the markdown files of jupyter notebooks, or of folders of jupyter notebooks.
+        All the notebooks are converted in a single run, by a pool of worker processes.
+        :param paths: str: paths to the files or folders to refresh ("./" if none is given, with since or staged: only
+        refresh the changed notebooks under these paths)
+        :param stdin: bool: also read NUL-separated paths from the standard input, e.g. from
+        `git diff --cached --name-only -z` (False by default)
+        :param timings: bool: print the total and per-notebook conversion timings (False by default)
+        :param force: bool: convert the notebooks even if they did not change since their last conversion (False by
+        default)
+        :param jobs: int: number of worker processes converting notebooks in parallel (number of cores by default)
+        :param engine: str: conversion engine, "nbconvert" (default) or "native" (renders the cells directly, much
+        faster, same result)
+        :param loader: str: notebook loader, "nbformat" (nbformat.read), "fast" (parses the notebook with orjson when it
+        is installed, without validating it), "stream" (parses the notebook chunk by chunk and skips the outputs that
+        never reach the markdown file: images, text outputs, tracebacks) or "auto" (default, streams the notebooks
+        larger than 32 MB, fast for the others)
+        :param validate: bool: validate every notebook against the nbformat schema (by default only the notebooks
+        converted for the first time are validated by the fast and stream loaders) (False by default)
+        :param render_cache: bool: with the native engine, only render the cells that changed since their last
+        conversion, the rendered cells are cached in .git/obsidianize/render_cache.sqlite (True by default)
+        :param include: str: glob of the notebooks to convert in the folders, matched on their name, or on their path
+        relative to the folder if it contains a / ("*.ipynb" by default)
+        :param exclude: str: comma-separated .gitignore-style patterns of the paths to skip in the folders (e.g.
+        --exclude "drafts/,*.tmp.ipynb")
+        :param gitignore: bool: also skip the paths ignored by the .gitignore files of the folders (True by default)
+        :param recursive: bool: also convert the notebooks of the subfolders of the folders (True by default; .git,
+        assets, virtual environments, node_modules... are never searched)
+        :param daemon: bool: send the conversions to the daemon of the repository if one is running (see serve)
+        (True by default)
+        :param profile: bool: print the wall time, CPU time and net allocated memory blocks of each conversion stage
+        (load, paths, export, format, render, save) for each notebook, and save them as JSON in
+        .git/obsidianize/profile.json (the conversions are then done in process, not by the daemon) (False by default)
+        :param profile_dump: bool: with profile, also convert the slowest notebook again under cProfile and save the
+        statistics to .git/obsidianize/profile.prof (False by default)
+        :param since: str: only refresh the notebooks added, modified or renamed since this git revision (e.g.
+        ORIG_HEAD after a pull), the markdown files and assets of the renamed notebooks are moved
+        :param staged: bool: only refresh the notebooks with staged changes (compared with since if it is given)
+        :return: nothing (will convert the files in place)
+        """
+        if since is not None or staged:
+            paths = _collect_changed_notebooks(paths, None if since is None else str(since), staged)
         else:
-            raise ValueError("path should lead to a .ipynb file or a folder")
+            paths = _collect_paths(paths, stdin)
 
-        # Make the path absolute
-        path = os.path.abspath(path)
-        print(f"{path} converted to markdown")
+        report = _run_conversions(paths, force=force, jobs=jobs, engine=engine, loader=loader,
+                                  validate=validate, render_cache=render_cache, daemon=daemon and not profile,
+                                  profile=profile,
+                                  discovery=dict(include=include, exclude=exclude, gitignore=gitignore,
+                                                 recursive=recursive))
+        report.print_summary(timings=timings)
+        if profile:
+            _report_profile(report, engine=engine, loader=loader, render_cache=render_cache, dump=profile_dump)
 
-    def refresh(
+        for path in paths:
+            if os.path.exists(path):
+                # Make the path absolute
+                path = os.path.abspath(path)
+                print(f"{path} refreshed")
+        if report.failed:
+            sys.exit(1)
+
+    def watch(
             self,
-            path: str = "./"
+            path: str = "./",
+            engine: str = "nbconvert",
+            debounce: float = 0.3,
+            polling: bool = False,
+            interval: float = 1.0,
+            include: str = "*.ipynb",
+            exclude=(),
+            gitignore: bool = True,
     ):
         """
-        This function refreshes the markdown files in a folder.
-        :param path: str: path to the folder to refresh
+        This function watches a folder and reconverts the jupyter notebooks as soon as they are saved, until interrupted.
+        :param path: str: path to the folder to watch (its subfolders are watched too)
+        :param engine: str: conversion engine, "nbconvert" (default) or "native"
+        :param debounce: float: how long to wait for the writes of a notebook to settle before converting it, in
+        seconds (0.3 by default)
+        :param polling: bool: poll the modification times instead of using inotify (False by default, polling is used
+        anyway where inotify is not available)
+        :param interval: float: the polling interval, in seconds (1 by default)
+        :param include: str: glob of the notebooks to convert, matched on their name, or on their path relative to the
+        folder if it contains a / ("*.ipynb" by default)
+        :param exclude: str: comma-separated .gitignore-style patterns of the paths not to watch
+        :param gitignore: bool: do not watch the paths ignored by the .gitignore files of the folder (True by default)
         :return: nothing (will convert the files in place)
         """
-        # If path does not exist, assume the file has been deleted in the commit
-        # in this case we still want to keep the assets as to not lose them in the obsidian notes
-        if not os.path.exists(path):
-            print(f"{path} does not exist")
-            return
-        # Check if the path is a directory or a .ipynb file
-        if os.path.isdir(path):
-            convert_all_notebooks_to_md(path)
-        elif path.endswith(".ipynb"):
-            convert_notebook_to_md(path)
+        if not os.path.isdir(path):
+            raise ValueError("path should lead to a folder")
+        if engine not in ENGINES:
+            raise ValueError(f"engine should be one of {', '.join(ENGINES)}")
+        if engine == "nbconvert":
+            # Warm the pipeline up before the first save
+            get_markdown_exporter()
 
-        # Make the path absolute
-        path = os.path.abspath(path)
-        print(f"{path} refreshed")
+        def on_change(notebooks):
+            report = convert_notebooks_to_md(notebooks, jobs=1, engine=engine)
+            report.print_summary(timings=True)
+
+        watch(path, debounce=debounce, polling=polling, interval=interval, on_change=on_change, include=include,
+              exclude=exclude, gitignore=gitignore)
+
+    def serve(
+            self,
+            path: str = "./",
+            engine: str = "nbconvert",
+    ):
+        """
+        This function runs a conversion daemon for the git repository located at path, until interrupted.
+        The daemon keeps the conversion pipeline warm, convert and refresh (and so the git hook) send it their
+        conversions when it is running.
+        :param path: str: path to the git repository
+        :param engine: str: conversion engine the daemon is warmed up for, "nbconvert" (default) or "native" (each
+        request is converted with the engine given to convert or refresh)
+        :return: nothing
+        """
+        if not os.path.isdir(os.path.join(path, ".git")):
+            raise ValueError("path should lead to a git repository")
+        if engine not in ENGINES:
+            raise ValueError(f"engine should be one of {', '.join(ENGINES)}")
+        serve(path, engine=engine)
+
+    def gc(
+            self,
+            path: str = "./",
+            dry_run: bool = False,
+    ):
+        """
+        This function deletes the assets exported by obsidianize in the git repository located at path that no markdown
+        file of the vault references any more (e.g. the figures of a notebook that have been renamed or removed). The
+        files of the assets folder that obsidianize did not export are never deleted.
+        :param path: str: path to the git repository
+        :param dry_run: bool: only list the assets that would be deleted (False by default)
+        :return: nothing
+        """
+        if not os.path.isdir(os.path.join(path, ".git")):
+            raise ValueError("path should lead to a git repository")
+        orphans = collect_garbage(path, dry_run=dry_run)
+        for orphan, _ in orphans:
+            print(f"{orphan} {'would be removed' if dry_run else 'removed'}")
+        size = sum(size for _, size in orphans) / 1e6
+        print(f"{len(orphans)} unreferenced asset(s), {size:.1f} MB {'to free' if dry_run else 'freed'}")
 
     def help(
             self,
@@ -106,11 +309,131 @@ class Obsidianize:
             print(self.convert.__doc__)
         elif function == "refresh":
             print(self.refresh.__doc__)
+        elif function == "watch":
+            print(self.watch.__doc__)
+        elif function == "serve":
+            print(self.serve.__doc__)
+        elif function == "gc":
+            print(self.gc.__doc__)
         else:
             print("Available functions:")
             print(self.setup.__doc__)
             print(self.convert.__doc__)
             print(self.refresh.__doc__)
+            print(self.watch.__doc__)
+            print(self.serve.__doc__)
+            print(self.gc.__doc__)
+
+
+def _collect_paths(paths: tuple, stdin: bool) -> list:
+    """
+    Function to gather the paths given on the command line and, optionally, on the standard input.
+    :param paths: tuple: the paths given on the command line
+    :param stdin: bool: whether to read NUL-separated paths from the standard input
+    :return: list: the paths to process ("./" if none is given)
+    """
+    paths = [str(path) for path in paths]
+    if stdin:
+        paths.extend(read_paths_from_stdin())
+    elif not paths:
+        paths = ["./"]
+    return paths
+
+
+def _collect_changed_notebooks(paths: tuple, since: str, staged: bool) -> list:
+    """
+    Function to find the notebooks of the current repository changed since a revision, or staged, and to move the
+    outputs of the renamed ones.
+    :param paths: tuple: the paths given on the command line, only the changes under them are kept (all if empty)
+    :param since: str: the git revision to compare with (None to compare with the index, or HEAD if staged)
+    :param staged: bool: only keep the staged changes
+    :return: list: the paths to the notebooks to convert
+    """
+    repo_path = find_ancestor_with(os.getcwd(), ".git")
+    if repo_path is None:
+        raise ValueError("since and staged can only be used in a git repository")
+    changes = get_notebook_changes(repo_path, since=since, staged=staged)
+    if paths:
+        prefixes = [os.path.abspath(path) for path in paths]
+        changes = [change for change in changes
+                   if any(_is_under(path, prefix) for prefix in prefixes
+                          for path in (change.path, change.old_path) if path is not None)]
+    return apply_notebook_changes(repo_path, changes)
+
+
+def _is_under(path: str, prefix: str) -> bool:
+    return path == prefix or path.startswith(prefix.rstrip(os.sep) + os.sep)
+
+
+def _run_conversions(paths: list, force: bool, jobs: int, engine: str, daemon: bool, profile: bool = False,
+                     loader: str = "auto", validate: bool = False, discovery: dict = None, render_cache: bool = True):
+    """
+    Function to convert notebooks with the daemon of the current repository if one is running, in process otherwise.
+    :param paths: list: the paths to the files or folders to convert
+    :param force: bool: convert the notebooks even if they are up to date
+    :param jobs: int: the number of worker processes (of the daemon, or of this process)
+    :param engine: str: the conversion engine
+    :param daemon: bool: whether to try the daemon first
+    :param profile: bool: record the stage timings of the in process conversions
+    :param loader: str: the notebook loader
+    :param validate: bool: validate every notebook against the nbformat schema
+    :param discovery: dict: the options of the search of the notebooks in the folders (include, exclude, gitignore,
+    recursive), see NotebookDiscovery
+    :param render_cache: bool: only render the cells that changed, with the native engine
+    :return: ConversionReport: the summary of the conversion
+    """
+    repo_path = find_ancestor_with(os.getcwd(), ".git") if daemon else None
+    if repo_path is not None and os.path.exists(get_socket_path(repo_path)):
+        existing_paths = []
+        for path in paths:
+            if os.path.exists(path):
+                existing_paths.append(os.path.abspath(path))
+            else:
+                print(f"{path} does not exist")
+        response = request_daemon(repo_path, {"command": "convert", "paths": existing_paths, "force": force,
+                                             "engine": engine, "loader": loader, "validate": validate,
+                                             "render_cache": render_cache, "discovery": discovery, "jobs": jobs})
+        if response is not None and response["ok"]:
+            return ConversionReport.from_dict(response["report"])
+        if response is not None:
+            print(f"The obsidianize daemon failed ({response['error']}), converting in process")
+        paths = existing_paths
+
+    return convert_notebooks_to_md(paths, force=force, jobs=jobs, engine=engine, profile=profile, loader=loader,
+                                   validate=validate, render_cache=render_cache, **(discovery or {}))
+
+
+def _report_profile(report: ConversionReport, engine: str, dump: bool, loader: str = "auto",
+                    render_cache: bool = True):
+    """
+    Function to print and save the stage timings of a profiled conversion.
+    :param report: ConversionReport: the report of the conversion
+    :param engine: str: the conversion engine
+    :param loader: str: the notebook loader
+    :param render_cache: bool: only render the cells that changed, with the native engine
+    :param dump: bool: convert the slowest notebook again under cProfile and save the statistics
+    :return: nothing
+    """
+    if not report.profiles:
+        return
+    print_profiles(report.profiles)
+    report.print_exporter_cache()
+    repo_path = find_ancestor_with(os.getcwd(), ".git")
+    folder = get_cache_folder(repo_path) if repo_path is not None else os.getcwd()
+    json_path = os.path.join(folder, "profile.json")
+    save_profiles(report.profiles, json_path)
+    print(f"profile saved to {json_path}")
+
+    if dump and report.converted:
+        import cProfile
+
+        slowest = max(report.converted, key=lambda item: item[1])[0]
+        dump_path = os.path.join(folder, "profile.prof")
+        profiler = cProfile.Profile()
+        profiler.runcall(convert_notebook_to_md, os.path.abspath(slowest), engine=engine, loader=loader,
+                         render_cache=render_cache)
+        profiler.dump_stats(dump_path)
+        print(f"cProfile statistics of {slowest} saved to {dump_path} (read them with python -m pstats {dump_path})")
 
 
 def main_cli():
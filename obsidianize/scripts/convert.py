@@ -10,13 +10,21 @@ import os
 import sys
 from pathlib import Path
 
-import nbformat
 import fire
 
-from obsidianize.src.utils.path_utils import get_repo_path
+from obsidianize.src.utils.path_utils import find_ancestor_with
+from obsidianize.src.utils.discovery import NotebookDiscovery
+from obsidianize.src.utils.context import ConversionContext
+from obsidianize.src.utils.profiling import Profiler, get_stage
 from obsidianize.src.utils.to_markdown import convert_to_markdown
 from obsidianize.src.utils.format_md import format_markdown
+from obsidianize.src.utils.native_md import render_markdown, code_blocks_closed, NativeRendererFallback
+from obsidianize.src.utils.load_nb import LOADERS, load_notebook
+from obsidianize.src.utils.render_cache import RenderCache, get_render_cache
 from obsidianize.src.utils.save_md import save_markdown
+from obsidianize.src.utils.manifest import ConversionManifest
+from obsidianize.src.utils.report import ConversionReport
+from obsidianize.scripts.parallel import run_conversions
 
 
 def main(
@@ -37,12 +45,34 @@ def main(
         raise ValueError("path should lead to a .ipynb file or a folder")
 
 
-def convert_notebook_to_md(path: str):
+ENGINES = ("nbconvert", "native")
+
+
+def convert_notebook_to_md(
+        path: str,
+        engine: str = "nbconvert",
+        profiler: Profiler = None,
+        loader: str = "auto",
+        validate: bool = False,
+        render_cache: bool = True,
+):
     """
     Function to convert a jupyter notebook to a markdown file.
-    :param path:
-    :return:
+    :param path: str: path to the notebook to convert
+    :param engine: str: "nbconvert" to render the notebook with nbconvert then format it, "native" to render it
+    directly from its cells (same result, much faster; falls back to nbconvert for the notebooks it cannot handle)
+    :param profiler: Profiler: records the timings of the conversion stages (None to disable profiling)
+    :param loader: str: how to load the notebook, "nbformat", "fast", "stream" or "auto" (see load_nb.load_notebook)
+    :param validate: bool: validate the notebook against the nbformat schema (the nbformat loader always does)
+    :param render_cache: bool: with the native engine, only render the cells missing from the render cache of the
+    repository (see render_cache.RenderCache)
+    :return: bool: True if the markdown file has been written, False if it was already identical (or the notebook does
+    not exist)
     """
+    if engine not in ENGINES:
+        raise ValueError(f"engine should be one of {', '.join(ENGINES)}")
+    if loader not in LOADERS:
+        raise ValueError(f"loader should be one of {', '.join(LOADERS)}")
     # Get the cwd
     cwd = Path.cwd()
     # # Check if the cwd is a repository (check presence of .git with Path)
@@ -53,7 +83,7 @@ def convert_notebook_to_md(path: str):
 
     # Check if the path exists, if not do nothing
     if not os.path.exists(path):
-        return
+        return False
     # Check if the path is a file
     if not os.path.isfile(path):
         raise ValueError("path should lead to a file")
@@ -61,25 +91,79 @@ def convert_notebook_to_md(path: str):
     if not path.endswith(".ipynb"):
         raise ValueError("path should lead to a jupyter notebook")
 
-    # Load the notebook
-    with open(path, "r") as f:
-        notebook = nbformat.read(f, as_version=4)
+    # Load the notebook (nbformat is imported by the loader so that the CLI starts fast when a daemon does the
+    # conversions)
+    with get_stage(profiler, "load"):
+        notebook, complete = load_notebook(path, loader, validate=validate)
+        # The skipped outputs only never reach the markdown file if they are rendered outside of the code blocks
+        if not complete and not code_blocks_closed(notebook):
+            notebook, complete = load_notebook(path, "nbformat")
+
+    context = ConversionContext(path)
+    if profiler is not None:
+        # The paths are resolved lazily by the first display, resolve them beforehand to time them separately
+        with profiler.stage("paths"):
+            try:
+                context.assets_link_folder
+            except Exception:
+                # Only an error if the notebook has displays, in which case the formatting raises it again
+                pass
+
+    cache = None
+    if engine == "native" and render_cache:
+        repo_path = find_ancestor_with(os.path.dirname(path), ".git")
+        if repo_path is not None:
+            cache = get_render_cache(repo_path)
+
+    markdown = render_notebook(notebook, path, engine, context, profiler, cache=cache)
+
+    # Save the markdown (unless the file is already identical)
+    with get_stage(profiler, "save"):
+        return save_markdown(markdown, path)
+
+
+def render_notebook(
+        notebook,
+        path: str,
+        engine: str = "nbconvert",
+        context: ConversionContext = None,
+        profiler: Profiler = None,
+        embeds: list = None,
+        cache: RenderCache = None,
+) -> str:
+    """
+    Function to render a loaded notebook to Obsidian markdown.
+    :param notebook: NotebookNode: the notebook (version 4)
+    :param path: str: the path to the notebook
+    :param engine: str: the conversion engine ("nbconvert" or "native"), see convert_notebook_to_md
+    :param context: ConversionContext: the paths of the notebook, if they are already resolved
+    :param profiler: Profiler: records the timings of the conversion stages (None to disable profiling)
+    :param embeds: list: list extended with the (display type, title, link) of each asset embedded (None to skip)
+    :param cache: RenderCache: the cache of the cells rendered by the native engine (None to render every cell)
+    :return: str: the markdown string
+    """
+    if engine == "native":
+        try:
+            # Render the notebook directly to obsidian markdown
+            with get_stage(profiler, "render"):
+                return render_markdown(notebook, path, context, embeds, cache=cache)
+        except NativeRendererFallback:
+            pass
 
     # Convert the notebook to markdown
-    markdown = convert_to_markdown(notebook)
+    with get_stage(profiler, "export"):
+        markdown = convert_to_markdown(notebook)
 
     # Format the markdown
-    markdown = format_markdown(markdown, path)
-
-    # Save the markdown
-    save_markdown(markdown, path)
+    with get_stage(profiler, "format"):
+        return format_markdown(markdown, path, context, embeds)
 
 
 def convert_all_notebooks_to_md(folder: str):
     """
-    Function to convert all the jupyter notebooks in a folder to markdown files.
-    :param folder:
-    :return:
+    Function to convert all the jupyter notebooks in a folder (and its subfolders) to markdown files.
+    :param folder: str: path to the folder
+    :return: nothing, will convert the files in place
     """
 
     # Check if the path exists, if not do nothing
@@ -90,14 +174,156 @@ def convert_all_notebooks_to_md(folder: str):
     if not os.path.isdir(folder):
         raise ValueError("path should lead to a folder")
 
-    # Get all the files in the folder
-    files = os.listdir(folder)
-    # Filter the files to keep only the jupyter notebooks
-    notebooks = [f for f in files if f.endswith(".ipynb")]
+    # Convert each notebook to markdown, while the folder is walked
+    for notebook in NotebookDiscovery(folder).iter_notebooks():
+        convert_notebook_to_md(notebook)
+
 
-    # Convert each notebook to markdown
-    for notebook in notebooks:
-        convert_notebook_to_md(os.path.join(folder, notebook))
+def convert_notebooks_to_md(
+        paths,
+        force: bool = False,
+        jobs: int = None,
+        engine: str = "nbconvert",
+        profile: bool = False,
+        loader: str = "auto",
+        validate: bool = False,
+        include: str = "*.ipynb",
+        exclude=(),
+        gitignore: bool = True,
+        recursive: bool = True,
+        render_cache: bool = True,
+) -> ConversionReport:
+    """
+    Function to convert several jupyter notebooks, or folders of jupyter notebooks, in a single run.
+    Paths that do not exist are reported and skipped (e.g. notebooks deleted in the commit), as are files that are not
+    jupyter notebooks. Notebooks that did not change since their last conversion (according to the conversion manifest
+    of their repository) are skipped as well, unless force is True.
+    The folders are searched (recursively by default) while the first notebooks found are already being converted.
+    The notebooks are converted by a pool of jobs worker processes, errors are collected per notebook in the report.
+    :param paths: iterable of str: paths to the files or folders to convert
+    :param force: bool: convert the notebooks even if they are up to date
+    :param jobs: int: the number of worker processes (the number of cores by default, 1 to convert in this process)
+    :param engine: str: the conversion engine ("nbconvert" or "native"), see convert_notebook_to_md
+    :param profile: bool: record the timings of the conversion stages of each notebook in the report
+    :param loader: str: how to load the notebooks ("nbformat", "fast", "stream" or "auto"), see convert_notebook_to_md
+    :param validate: bool: validate all the notebooks against the nbformat schema (the notebooks the manifest does not
+    know yet are always validated)
+    :param include: str: the glob the notebooks of the folders match, see NotebookDiscovery
+    :param exclude: str or iterable of str: .gitignore-style patterns of the paths to skip in the folders
+    :param gitignore: bool: also skip the paths of the folders ignored by their .gitignore files
+    :param recursive: bool: search the subfolders of the folders
+    :param render_cache: bool: with the native engine, only render the cells that changed since they were last
+    rendered, see convert_notebook_to_md
+    :return: ConversionReport: the summary of the conversion
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine should be one of {', '.join(ENGINES)}")
+    if loader not in LOADERS:
+        raise ValueError(f"loader should be one of {', '.join(LOADERS)}")
+
+    report = ConversionReport()
+    manifests = {}
+    to_convert = {}
+    # State of each notebook before its conversion, recorded in the manifest once it succeeded
+    states = {}
+    # The notebooks seen for the first time are validated, the others were when they were first converted
+    to_validate = set()
+
+    def iter_notebooks_to_convert():
+        for path in paths:
+            # If path does not exist, assume the file has been deleted in the commit
+            # in this case we still want to keep the assets as to not lose them in the obsidian notes
+            if not os.path.exists(path):
+                print(f"{path} does not exist")
+                continue
+            if os.path.isdir(path):
+                notebooks = NotebookDiscovery(path, include=include, exclude=exclude, gitignore=gitignore,
+                                              recursive=recursive).iter_notebooks()
+            elif path.endswith(".ipynb"):
+                notebooks = [path]
+            else:
+                continue
+
+            for notebook in notebooks:
+                absolute_path = os.path.abspath(notebook)
+                if absolute_path in to_convert:
+                    continue
+                manifest = _get_manifest(absolute_path, manifests, engine, loader)
+                if manifest is not None and not force and manifest.is_up_to_date(absolute_path):
+                    report.add_skipped(notebook)
+                    continue
+                to_convert[absolute_path] = notebook
+                if manifest is not None:
+                    states[absolute_path] = manifest.snapshot(absolute_path)
+                if validate or manifest is None or not manifest.is_known(absolute_path):
+                    to_validate.add(absolute_path)
+                yield absolute_path
+
+    conversions = run_conversions(iter_notebooks_to_convert(), jobs=jobs, validate_paths=to_validate, engine=engine,
+                                  profile=profile, loader=loader, render_cache=render_cache)
+    for absolute_path, seconds, error, written, stages, exporter_cache in conversions:
+        notebook = to_convert[absolute_path]
+        report.add_exporter_cache(*exporter_cache)
+        if stages is not None:
+            report.profiles[notebook] = stages
+        if error is not None:
+            report.add_failed(notebook, error)
+            continue
+        report.add_converted(notebook, seconds, written=written)
+        manifest = _get_manifest(absolute_path, manifests, engine, loader)
+        if manifest is not None:
+            manifest.record(absolute_path, states.pop(absolute_path))
+
+    for manifest in manifests.values():
+        if manifest is not None:
+            manifest.save()
+    report.finish()
+    return report
+
+
+def _get_manifest(notebook_path: str, manifests: dict, engine: str, loader: str):
+    """
+    Function to get the conversion manifest of the repository containing a notebook.
+    :param notebook_path: str: the absolute path to the notebook
+    :param manifests: dict: the manifests already loaded, by folder (updated in place)
+    :param engine: str: the conversion engine
+    :param loader: str: the notebook loader
+    :return: ConversionManifest: the manifest, or None if the notebook is not in a git repository
+    """
+    folder = os.path.dirname(notebook_path)
+    if folder not in manifests:
+        repo_path = find_ancestor_with(folder, ".git")
+        manifest = None
+        if repo_path is not None:
+            # Share the manifest between the folders of a same repository
+            manifest = next((m for m in manifests.values() if m is not None and m.repo_path == repo_path), None)
+            if manifest is None:
+                manifest = ConversionManifest(repo_path, _get_manifest_options(repo_path, engine, loader))
+        manifests[folder] = manifest
+    return manifests[folder]
+
+
+def _get_manifest_options(repo_path: str, engine: str, loader: str) -> dict:
+    # The options the markdown files depend on: the embeds link to the assets relative to the vault root
+    vault_root = find_ancestor_with(repo_path, ".obsidian")
+    assets_link_folder = None
+    if vault_root is not None:
+        assets_link_folder = os.path.relpath(os.path.join(repo_path, "assets"), vault_root).replace(os.sep, "/")
+    return {"engine": engine, "loader": loader, "vault_root": vault_root, "assets_link_folder": assets_link_folder}
+
+
+def read_paths_from_stdin() -> list:
+    """
+    Function to read a list of paths from the standard input.
+    The paths are expected to be NUL-separated (as output by `git diff -z`), newline-separated input is also accepted.
+    :return: list: the paths read
+    """
+    data = sys.stdin.buffer.read()
+    if b"\0" in data:
+        raw_paths = data.split(b"\0")
+    else:
+        raw_paths = data.splitlines()
+    return [os.fsdecode(raw_path) for raw_path in raw_paths if raw_path]
 
 
 def main_cli():
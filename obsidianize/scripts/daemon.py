@@ -0,0 +1,202 @@
+"""
+This file contains the conversion daemon: a resident process that keeps the conversion pipeline warm (nbconvert
+imported, exporter and templates built) and converts notebooks on request over a Unix domain
+socket. The CLI (and so the git hook) tries the daemon of the repository first, and converts in process when no daemon
+is running.
+The protocol is one JSON request per connection, answered by one JSON response, each on a single line.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import socketserver
+import tempfile
+import threading
+
+from obsidianize.src.utils.manifest import get_cache_folder
+
+SOCKET_NAME = "daemon.sock"
+# sun_path is limited to 108 bytes on Linux (104 on macOS)
+_MAX_SOCKET_PATH = 100
+
+
+def get_socket_path(repo_path: str) -> str:
+    """
+    Function to get the path of the daemon socket of a repository.
+    :param repo_path: str: the path to the repository
+    :return: str: the path to the socket (in the obsidianize cache folder of the repository, or in the temporary folder
+    if that path is too long for a socket)
+    """
+    socket_path = os.path.join(get_cache_folder(os.path.abspath(repo_path)), SOCKET_NAME)
+    if len(os.fsencode(socket_path)) > _MAX_SOCKET_PATH:
+        digest = hashlib.blake2b(os.fsencode(os.path.abspath(repo_path)), digest_size=8).hexdigest()
+        socket_path = os.path.join(tempfile.gettempdir(), f"obsidianize-{digest}.sock")
+    return socket_path
+
+
+class _InFlight:
+    """
+    A conversion in progress, that the requests for the same notebook wait for instead of converting it again.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.report = None
+
+
+class ConversionService:
+    """
+    The conversions done by the daemon. Requests for a notebook that is already being converted are coalesced: they
+    wait for the conversion in progress and share its result.
+    """
+
+    def __init__(self, engine: str = "nbconvert"):
+        # Engine of the requests that do not give one
+        self.engine = engine
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        # The batches (and the manifest updates) are converted one at a time, each by a pool of workers
+        self.convert_lock = threading.Lock()
+
+    def convert(self, paths: list, force: bool = False, loader: str = "auto", validate: bool = False,
+                discovery: dict = None, render_cache: bool = True, engine: str = None, jobs: int = None) -> dict:
+        """
+        Function to convert notebooks, or folders of notebooks.
+        :param paths: list: the absolute paths to convert
+        :param force: bool: convert the notebooks even if they are up to date
+        :param loader: str: the notebook loader ("nbformat", "fast", "stream" or "auto")
+        :param validate: bool: validate every notebook against the nbformat schema
+        :param discovery: dict: the options of the search of the notebooks in the folders, see NotebookDiscovery
+        :param render_cache: bool: only render the cells that changed, with the native engine
+        :param engine: str: the conversion engine ("nbconvert" or "native", the engine of the daemon if None)
+        :param jobs: int: the number of worker processes (the number of cores by default, 1 to convert in the daemon)
+        :return: dict: the conversion report (see ConversionReport.to_dict)
+        """
+        from obsidianize.scripts.convert import convert_notebooks_to_md
+        from obsidianize.src.utils.report import ConversionReport
+
+        owned, waiting = [], []
+        with self.lock:
+            for path in paths:
+                if path in self.in_flight:
+                    waiting.append(self.in_flight[path])
+                else:
+                    self.in_flight[path] = _InFlight()
+                    owned.append(path)
+
+        report = ConversionReport()
+        try:
+            if owned:
+                with self.convert_lock:
+                    report = convert_notebooks_to_md(owned, force=force, jobs=jobs, engine=engine or self.engine,
+                                                     loader=loader, validate=validate, render_cache=render_cache,
+                                                     **(discovery or {}))
+        finally:
+            with self.lock:
+                for path in owned:
+                    in_flight = self.in_flight.pop(path)
+                    in_flight.report = report
+                    in_flight.done.set()
+
+        for in_flight in waiting:
+            in_flight.done.wait()
+            if in_flight.report is not None:
+                report.converted.extend(in_flight.report.converted)
+                report.skipped.extend(in_flight.report.skipped)
+                report.failed.extend(in_flight.report.failed)
+        report.finish()
+        return report.to_dict()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            if request.get("command") == "ping":
+                response = {"ok": True}
+            elif request.get("command") == "convert":
+                report = self.server.service.convert(request["paths"], force=request.get("force", False),
+                                                     loader=request.get("loader", "auto"),
+                                                     validate=request.get("validate", False),
+                                                     discovery=request.get("discovery"),
+                                                     render_cache=request.get("render_cache", True),
+                                                     engine=request.get("engine"), jobs=request.get("jobs"))
+                response = {"ok": True, "report": report}
+            else:
+                response = {"ok": False, "error": f"unknown command {request.get('command')!r}"}
+        except Exception as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class _DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(repo_path: str, engine: str = "nbconvert"):
+    """
+    Function to run the conversion daemon of a repository, until interrupted.
+    :param repo_path: str: the path to the repository
+    :param engine: str: the conversion engine of the requests that do not give one ("nbconvert" or "native"), the
+    exporter is built beforehand for nbconvert
+    :return: nothing
+    """
+    socket_path = get_socket_path(repo_path)
+    if request_daemon(repo_path, {"command": "ping"}) is not None:
+        raise ValueError(f"a daemon is already running for {os.path.abspath(repo_path)}")
+    # Remove the socket left by a daemon that did not stop cleanly
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+
+    if engine == "nbconvert":
+        # Warm the pipeline up before the first request
+        from obsidianize.src.utils.to_markdown import get_markdown_exporter
+        get_markdown_exporter()
+
+    # The workers of the conversions must not inherit the threads, locks and open caches of the daemon
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method("forkserver", force=True)
+
+    server = _DaemonServer(socket_path, _RequestHandler)
+    server.service = ConversionService(engine=engine)
+    print(f"obsidianize daemon listening on {socket_path}, press Ctrl+C to stop")
+    # Stop cleanly (removing the socket) when terminated as well
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def request_daemon(repo_path: str, request: dict, timeout: float = None):
+    """
+    Function to send a request to the daemon of a repository.
+    :param repo_path: str: the path to the repository
+    :param request: dict: the request ({"command": "convert", "paths": [...], "engine": "native", ...} or
+    {"command": "ping"})
+    :param timeout: float: the maximum time to wait for the response, in seconds (None to wait as long as needed)
+    :return: dict: the response, or None if no daemon is running
+    """
+    socket_path = get_socket_path(repo_path)
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(socket_path)
+            client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with client.makefile("rb") as response:
+                line = response.readline()
+    except OSError:
+        return None
+    if not line:
+        return None
+    return json.loads(line)
@@ -0,0 +1,121 @@
+"""
+This file contains the garbage collection of the assets: the assets exported by obsidianize that no markdown file of
+the vault references any more (e.g. a figure that has been renamed or removed from its notebook) are deleted, along with
+their manifest entries. The files of the assets folder that are not in the asset manifest are never deleted.
+"""
+import os
+import re
+from urllib.parse import unquote
+
+from obsidianize.src.utils.asset_manifest import ASSET_MANIFEST_NAME, get_asset_manifest
+from obsidianize.src.utils.discovery import is_pruned_folder
+from obsidianize.src.utils.path_utils import find_ancestor_with
+
+# [title](link), ![title](link), [[link]] and ![[link]] / ![[link|alias]]
+LINK_RE = re.compile(r"\[[^\]\n]*\]\(\s*<?([^)>\n]+?)>?\s*\)|\[\[([^\]|#\n]+)")
+
+
+def iter_markdown_files(root: str):
+    """
+    Function to list the markdown files of a folder tree, outside of the assets folders.
+    :param root: str: the path to the folder
+    :return: generator: the paths to the markdown files
+    """
+    for folder, subfolders, files in os.walk(root):
+        subfolders[:] = [subfolder for subfolder in subfolders if not is_pruned_folder(subfolder)]
+        for file in files:
+            if file.endswith(".md"):
+                yield os.path.join(folder, file)
+
+
+def find_embedded_stems(markdown_path: str) -> tuple:
+    """
+    Function to find the files embedded or linked by a markdown file.
+    The links are resolved from the vault root (as written by obsidianize) and from the folder of the markdown file,
+    the links without a folder (e.g. ![[figure.png]]) are resolved by Obsidian anywhere in the vault, so they are kept
+    by name.
+    :param markdown_path: str: the path to the markdown file
+    :return: tuple: (stems, names) with stems the set of the absolute paths of the linked files, and names the set of
+    the names of the files linked without a folder, both without their extension (so that the .svg and .html siblings
+    of an embedded .png, or the side file of a DataFrame, are included too)
+    """
+    stems = set()
+    names = set()
+    try:
+        with open(markdown_path, "r", encoding="utf-8") as f:
+            content = f.read()
+    except (OSError, UnicodeDecodeError):
+        return stems, names
+    folder = os.path.dirname(os.path.abspath(markdown_path))
+    roots = [folder]
+    vault_root = find_ancestor_with(folder, ".obsidian")
+    if vault_root is not None:
+        roots.append(vault_root)
+    for match in LINK_RE.finditer(content):
+        link = unquote(match.group(1) or match.group(2)).strip()
+        if "/" not in link:
+            names.add(os.path.splitext(link)[0])
+        for root in roots:
+            stems.add(os.path.splitext(os.path.normpath(os.path.join(root, link)))[0])
+    return stems, names
+
+
+def find_referenced_stems(root: str) -> tuple:
+    """
+    Function to find the files embedded or linked by the markdown files of a folder tree.
+    :param root: str: the folder (the vault, or the repository if it is not in a vault)
+    :return: tuple: (stems, names), see find_embedded_stems
+    """
+    stems = set()
+    names = set()
+    for markdown_path in iter_markdown_files(root):
+        markdown_stems, markdown_names = find_embedded_stems(markdown_path)
+        stems |= markdown_stems
+        names |= markdown_names
+    return stems, names
+
+
+def collect_garbage(repo_path: str, dry_run: bool = False) -> list:
+    """
+    Function to delete the assets exported by obsidianize in a repository that no markdown file of the vault
+    references.
+    Only the files recorded in the asset manifest are deleted, the other files of the assets folder (e.g. added by
+    hand) are never touched.
+    :param repo_path: str: the path to the repository
+    :param dry_run: bool: only list the assets that would be deleted
+    :return: list: tuples (path, size) of the unreferenced assets
+    """
+    repo_path = os.path.abspath(repo_path)
+    assets_root = os.path.join(repo_path, "assets")
+    if not os.path.exists(os.path.join(assets_root, ASSET_MANIFEST_NAME)):
+        return []
+    manifest = get_asset_manifest(repo_path)
+    # The notes of the whole vault may embed the assets of the repository
+    stems, names = find_referenced_stems(find_ancestor_with(repo_path, ".obsidian") or repo_path)
+
+    orphans = []
+    missing = []
+    for path, _, _, _ in manifest.iter_files():
+        if not os.path.isfile(path):
+            missing.append(path)
+            continue
+        stem = os.path.splitext(path)[0]
+        if stem in stems or os.path.basename(stem) in names:
+            continue
+        orphans.append((path, os.path.getsize(path)))
+    orphans.sort()
+    if dry_run:
+        return orphans
+
+    for path, _ in orphans:
+        os.remove(path)
+    # Forget the deleted assets, and the ones removed by hand
+    manifest.forget([path for path, _ in orphans] + missing)
+
+    # Remove the folders the deleted assets left empty
+    folders = {os.path.dirname(path) for path, _ in orphans}
+    for folder in sorted(folders, key=len, reverse=True):
+        while folder != assets_root and folder.startswith(assets_root + os.sep) and not os.listdir(folder):
+            os.rmdir(folder)
+            folder = os.path.dirname(folder)
+    return orphans
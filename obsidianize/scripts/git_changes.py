@@ -0,0 +1,129 @@
+"""
+This file contains the incremental refresh of a repository: git is asked, in a single call, for the notebooks that were
+added, modified, renamed or deleted since a revision (or in the index), so that only those are processed.
+The markdown file and the assets of a renamed notebook are moved instead of being generated again.
+"""
+import os
+import subprocess
+from collections import namedtuple
+
+from obsidianize.scripts.gc import find_embedded_stems
+from obsidianize.src.utils.asset_manifest import get_asset_manifest
+from obsidianize.src.utils.manifest import ConversionManifest
+
+# status is the first letter of the git status (A, C, D, M, R, T, U), paths are absolute, old_path is only set for
+# renames and copies
+NotebookChange = namedtuple("NotebookChange", ["status", "path", "old_path", "similarity"])
+
+
+def get_notebook_changes(repo_path: str, since: str = None, staged: bool = False) -> list:
+    """
+    Function to list the notebooks changed in a repository, with a single git diff call.
+    :param repo_path: str: the path to the repository
+    :param since: str: the revision to compare with (e.g. ORIG_HEAD after a pull, or a branch name), None to compare
+    with the index (or with HEAD if staged is True)
+    :param staged: bool: only list the staged changes (compared with HEAD, or with since)
+    :return: list: the NotebookChange of each notebook
+    """
+    command = ["git", "-C", repo_path, "diff", "--name-status", "-z", "-M"]
+    if staged:
+        command.append("--cached")
+    if since is not None:
+        command.append(since)
+    command.extend(["--", "*.ipynb"])
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise Exception(f"git diff failed: {os.fsdecode(result.stderr).strip()}")
+
+    changes = []
+    fields = [os.fsdecode(field) for field in result.stdout.split(b"\0") if field]
+    index = 0
+    while index < len(fields):
+        status = fields[index]
+        if status[0] in "RC":
+            old_path, path = fields[index + 1], fields[index + 2]
+            index += 3
+        else:
+            old_path, path = None, fields[index + 1]
+            index += 2
+        changes.append(NotebookChange(
+            status=status[0],
+            path=os.path.join(repo_path, path),
+            old_path=os.path.join(repo_path, old_path) if old_path is not None else None,
+            similarity=int(status[1:]) if status[1:] else None,
+        ))
+    return changes
+
+
+def apply_notebook_changes(repo_path: str, changes: list) -> list:
+    """
+    Function to move the markdown files and assets of the renamed notebooks, and to forget the deleted ones.
+    The markdown file and the assets of a deleted notebook are kept, so that the notes embedding them are not broken
+    (obsidianize gc removes the assets once nothing embeds them).
+    :param repo_path: str: the path to the repository
+    :param changes: list: the NotebookChange of each notebook
+    :return: list: the paths to the notebooks to convert
+    """
+    manifest = ConversionManifest(repo_path)
+    to_convert = []
+    for change in changes:
+        if change.status == "D":
+            manifest.forget(change.path)
+            print(f"{change.path} deleted, its markdown file and assets are kept")
+        elif change.status == "R":
+            if _move_notebook_outputs(repo_path, change.old_path, change.path):
+                # The assets moved to another folder, the embeds of the markdown file have to be generated again
+                manifest.forget(change.old_path)
+            else:
+                manifest.rename(change.old_path, change.path)
+            print(f"{change.old_path} renamed to {change.path}")
+            # Renamed notebooks that also changed are converted, the others are recognised as up to date
+            to_convert.append(change.path)
+        else:
+            to_convert.append(change.path)
+    manifest.save()
+    return to_convert
+
+
+def _get_assets_folder(repo_path: str, notebook_path: str) -> str:
+    return os.path.join(repo_path, "assets", os.path.relpath(os.path.dirname(notebook_path), repo_path))
+
+
+def _move_notebook_outputs(repo_path: str, old_path: str, new_path: str) -> bool:
+    """
+    Function to move the markdown file of a renamed notebook, and its assets if it moved to another folder.
+    The assets of the notebook are the ones recorded for it in the asset manifest, and the ones its markdown file
+    embeds from its assets folder (for the assets exported before the manifest existed).
+    :param repo_path: str: the path to the repository
+    :param old_path: str: the previous absolute path to the notebook
+    :param new_path: str: the new absolute path to the notebook
+    :return: bool: True if the assets moved to another folder
+    """
+    old_markdown = old_path.replace(".ipynb", ".md")
+    new_markdown = new_path.replace(".ipynb", ".md")
+    old_assets = _get_assets_folder(repo_path, old_path)
+    new_assets = _get_assets_folder(repo_path, new_path)
+    asset_manifest = get_asset_manifest(repo_path)
+
+    moved_files = {}
+    if old_assets != new_assets and os.path.isdir(old_assets):
+        files = set(asset_manifest.get_notebook_files(old_path))
+        embedded_stems, embedded_names = find_embedded_stems(old_markdown)
+        for file in os.listdir(old_assets):
+            stem = os.path.splitext(os.path.join(old_assets, file))[0]
+            if stem in embedded_stems or os.path.basename(stem) in embedded_names:
+                files.add(os.path.join(old_assets, file))
+        for file in files:
+            if os.path.dirname(file) != old_assets or not os.path.isfile(file):
+                continue
+            moved_files[file] = os.path.join(new_assets, os.path.basename(file))
+        os.makedirs(new_assets, exist_ok=True)
+        for old_file, new_file in moved_files.items():
+            os.replace(old_file, new_file)
+        if not os.listdir(old_assets):
+            os.rmdir(old_assets)
+    asset_manifest.move_notebook(old_path, new_path, moved_files)
+
+    if os.path.exists(old_markdown) and not os.path.exists(new_markdown):
+        os.replace(old_markdown, new_markdown)
+    return old_assets != new_assets
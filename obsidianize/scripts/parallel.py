@@ -0,0 +1,101 @@
+"""
+This file contains the engine used to convert a batch of notebooks, either in this process or in a pool of worker
+processes. Each worker is warmed up once (nbconvert imported, exporter built, unless the notebooks are rendered by the
+native engine) and reused for all its notebooks.
+Errors are collected per notebook, so that one broken notebook does not abort the whole batch.
+"""
+import itertools
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from obsidianize.src.utils.profiling import Profiler
+from obsidianize.src.utils.to_markdown import ExporterCacheInfo, exporter_cache_info, get_markdown_exporter
+
+# Statistics of the exporter cache of this process when its previous conversion ended
+_last_cache_info = ExporterCacheInfo(0, 0, 0)
+
+
+def get_default_jobs() -> int:
+    """
+    Function to get the default number of worker processes (the number of cores available).
+    :return: int: the number of worker processes
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _init_worker(engine: str):
+    """
+    Function run once in each worker process, to build the markdown exporter before the first notebook arrives.
+    :param engine: str: the conversion engine, the native engine only imports nbconvert for the notebooks it falls back
+    on
+    :return: nothing
+    """
+    if engine == "nbconvert":
+        get_markdown_exporter()
+
+
+def _convert_one(path: str, options: dict) -> tuple:
+    """
+    Function to convert one notebook, catching the errors.
+    :param path: str: the absolute path to the notebook
+    :param options: dict: the keyword arguments of convert_notebook_to_md, and profile (bool) to time its stages
+    :return: tuple: (path, seconds, error, written, profile, exporter_cache) with error None if the conversion
+    succeeded, written False if the markdown file was already identical, profile the stage timings (None if profiling
+    is disabled), and exporter_cache the (hits, misses) of the exporter cache of the process since its previous
+    conversion (including the warm up of the worker)
+    """
+    global _last_cache_info
+
+    # Imported here as convert.py drives this engine
+    from obsidianize.scripts.convert import convert_notebook_to_md
+
+    options = dict(options)
+    profiler = Profiler() if options.pop("profile", False) else None
+    start = time.perf_counter()
+    try:
+        written = convert_notebook_to_md(path, profiler=profiler, **options)
+    except Exception as e:
+        error = "".join(traceback.format_exception_only(type(e), e)).strip()
+        written = False
+    else:
+        error = None
+    profile = profiler.stages if profiler is not None else None
+    cache_info = exporter_cache_info()
+    exporter_cache = (cache_info.hits - _last_cache_info.hits, cache_info.misses - _last_cache_info.misses)
+    _last_cache_info = cache_info
+    return path, time.perf_counter() - start, error, written, profile, exporter_cache
+
+
+def run_conversions(paths, jobs: int = None, validate_paths=(), **options):
+    """
+    Function to convert notebooks, in parallel if jobs allows it.
+    The paths are consumed lazily: the first notebooks are converted while the next ones are still being found.
+    :param paths: iterable of str: the absolute paths to the notebooks to convert
+    :param jobs: int: the number of worker processes (the number of cores by default, 1 to convert in this process)
+    :param validate_paths: set: the paths to the notebooks to validate against the nbformat schema (checked as each path
+    is taken, so the set can grow while paths is consumed)
+    :param options: the keyword arguments given to convert_notebook_to_md (e.g. engine), and profile
+    :return: generator of (path, seconds, error, written, profile, exporter_cache) tuples, in completion order
+    """
+    if jobs is None:
+        jobs = get_default_jobs()
+    paths = iter(paths)
+    # Start no more workers than there are notebooks
+    first_paths = list(itertools.islice(paths, max(jobs, 1)))
+
+    if jobs <= 1 or len(first_paths) <= 1:
+        for path in itertools.chain(first_paths, paths):
+            yield _convert_one(path, dict(options, validate=path in validate_paths))
+        return
+
+    with ProcessPoolExecutor(max_workers=len(first_paths), initializer=_init_worker,
+                             initargs=(options.get("engine", "nbconvert"),)) as executor:
+        futures = [executor.submit(_convert_one, path, dict(options, validate=path in validate_paths))
+                   for path in itertools.chain(first_paths, paths)]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,193 @@
+"""
+This file contains the watch mode: obsidianize stays resident, watches a folder for notebook writes and reconverts the
+notebooks that changed. It uses inotify on Linux (no CPU used while idle) and falls back to polling the modification
+times of the notebooks elsewhere. Events are debounced, as Jupyter writes a notebook several times when it saves it.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from obsidianize.src.utils.discovery import NotebookDiscovery
+
+# inotify constants, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+
+
+class InotifyWatcher:
+    """
+    Watcher using the Linux inotify API (through ctypes, no dependency needed), with one watch per folder searched by
+    the discovery.
+    """
+
+    def __init__(self, discovery: NotebookDiscovery):
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.discovery = discovery
+        self.folders = {}
+        try:
+            for folder in discovery.iter_folders():
+                self._add_watch(folder)
+        except OSError:
+            # e.g. more folders than the inotify watch limit, the caller falls back to polling
+            self.close()
+            raise
+
+    def _add_watch(self, folder: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed on {folder}")
+        self.folders[wd] = folder
+
+    def wait(self, timeout: float = None) -> set:
+        """
+        Function to wait for notebook writes.
+        :param timeout: float: the maximum time to wait, in seconds (None to wait forever)
+        :return: set: the paths of the notebooks written (empty if the timeout expired)
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed = set()
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            folder = self.folders.get(wd)
+            if folder is None:
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF):
+                self.folders.pop(wd, None)
+            elif mask & IN_ISDIR:
+                # Watch the folders created (or moved in) after the watcher started
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    for new_folder, notebooks in self.discovery.walk(os.path.join(folder, name)):
+                        self._add_watch(new_folder)
+                        changed.update(notebooks)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and self.discovery.accepts(os.path.join(folder, name)):
+                changed.add(os.path.join(folder, name))
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """
+    Watcher comparing the modification times of the notebooks at a regular interval, for platforms without inotify.
+    """
+
+    def __init__(self, discovery: NotebookDiscovery, interval: float = 1.0):
+        self.discovery = discovery
+        self.interval = interval
+        self.mtimes = self._scan()
+
+    def _scan(self) -> dict:
+        mtimes = {}
+        for path in self.discovery.iter_notebooks():
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                pass
+        return mtimes
+
+    def wait(self, timeout: float = None) -> set:
+        """
+        Function to wait for notebook writes.
+        :param timeout: float: the maximum time to wait, in seconds (None to wait forever)
+        :return: set: the paths of the notebooks written (empty if the timeout expired)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval if deadline is None else max(0.0, min(self.interval, deadline - time.monotonic()))
+            time.sleep(delay)
+            mtimes = self._scan()
+            changed = {path for path, mtime in mtimes.items() if self.mtimes.get(path) != mtime}
+            self.mtimes = mtimes
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def get_watcher(discovery: NotebookDiscovery, polling: bool = False, interval: float = 1.0):
+    """
+    Function to get the best watcher available for a folder.
+    :param discovery: NotebookDiscovery: the discovery of the notebooks of the folder to watch
+    :param polling: bool: force the polling watcher
+    :param interval: float: the polling interval, in seconds
+    :return: InotifyWatcher or PollingWatcher: the watcher
+    """
+    if not polling and hasattr(select, "select"):
+        try:
+            return InotifyWatcher(discovery)
+        except (OSError, AttributeError, TypeError):
+            # No inotify on this platform, or too many folders for the inotify watch limit
+            pass
+    return PollingWatcher(discovery, interval)
+
+
+def watch(
+        root: str,
+        debounce: float = 0.3,
+        polling: bool = False,
+        interval: float = 1.0,
+        on_change=None,
+        include: str = "*.ipynb",
+        exclude=(),
+        gitignore: bool = True,
+):
+    """
+    Function to watch a folder and reconvert the notebooks written, until interrupted.
+    :param root: str: the folder to watch
+    :param debounce: float: how long to wait for the writes of a notebook to settle before converting it, in seconds
+    :param polling: bool: force the polling watcher
+    :param interval: float: the polling interval, in seconds
+    :param on_change: callable: function called with the list of notebooks to convert
+    :param include: str: the glob the notebooks match, see NotebookDiscovery
+    :param exclude: str or iterable of str: .gitignore-style patterns of the paths not to watch
+    :param gitignore: bool: do not watch the paths ignored by the .gitignore files of the folder
+    :return: nothing
+    """
+    root = os.path.abspath(root)
+    discovery = NotebookDiscovery(root, include=include, exclude=exclude, gitignore=gitignore)
+    watcher = get_watcher(discovery, polling=polling, interval=interval)
+    print(f"Watching {root} for notebook changes ({type(watcher).__name__}), press Ctrl+C to stop")
+    try:
+        while True:
+            changed = watcher.wait()
+            # Wait for the burst of writes (e.g. Jupyter autosave) to end
+            while True:
+                more = watcher.wait(timeout=debounce)
+                if not more:
+                    break
+                changed |= more
+            changed = sorted(path for path in changed if os.path.isfile(path))
+            if changed:
+                on_change(changed)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
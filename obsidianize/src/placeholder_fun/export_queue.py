@@ -0,0 +1,194 @@
+"""
+This file contains the asynchronous export mode of the placeholder functions.
+When it is enabled, the obsidian_* functions take a snapshot of the figure or dataframe, put its export on a bounded
+queue served by background threads, and return as soon as the interactive display is done. flush() waits for the
+pending exports. Export errors are reported in the notebook by the next obsidian_* call, and raised by flush().
+"""
+import io
+import pickle
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+class ExportQueue:
+    """
+    A bounded queue of exports, run by a pool of threads.
+    Submitting blocks while max_pending exports are waiting, so that a notebook producing figures faster than they can
+    be exported does not keep an unbounded number of snapshots in memory.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 8):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="obsidianize-export")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.pending = set()
+        self.errors = []
+        self.lock = threading.Lock()
+
+    def submit(self, description: str, function, *args):
+        """
+        Function to queue an export.
+        :param description: str: what is exported, used in the error messages
+        :param function: callable: the export function
+        :param args: the arguments of the export function
+        :return: nothing
+        """
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(function, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(lambda done: self._done(description, done))
+
+    def _done(self, description: str, future):
+        with self.lock:
+            self.pending.discard(future)
+            if future.exception() is not None:
+                self.errors.append(f"{description}: {type(future.exception()).__name__}: {future.exception()}")
+        self.slots.release()
+
+    def pop_errors(self) -> list:
+        with self.lock:
+            errors, self.errors = self.errors, []
+        return errors
+
+    def wait(self):
+        """
+        Function to wait for all the pending exports.
+        :return: nothing
+        """
+        while True:
+            with self.lock:
+                pending = list(self.pending)
+            if not pending:
+                return
+            for future in pending:
+                # Wait without raising, the errors are collected by _done
+                future.exception()
+
+    def shutdown(self):
+        self.wait()
+        self.executor.shutdown()
+
+
+def set_async_export(enabled: bool = True, max_workers: int = 2, max_pending: int = 8):
+    """
+    Function to enable (or disable) the asynchronous export of the assets by obsidian_pyplot, obsidian_plotly and
+    obsidian_pandas. Call flush() at the end of the notebook (or before reading the assets) to wait for the exports.
+    :param enabled: bool: whether the exports should be asynchronous
+    :param max_workers: int: the number of export threads
+    :param max_pending: int: the maximum number of exports waiting in the queue (the obsidian_* calls block when it is
+    full)
+    :return: nothing
+    """
+    global _queue
+    with _queue_lock:
+        previous, _queue = _queue, None
+        if enabled:
+            _queue = ExportQueue(max_workers=max_workers, max_pending=max_pending)
+    if previous is not None:
+        previous.shutdown()
+        _report_errors(previous.pop_errors())
+
+
+def flush():
+    """
+    Function to wait for the pending asynchronous exports.
+    :return: nothing (raises an Exception if some exports failed)
+    """
+    queue = _queue
+    if queue is None:
+        return
+    queue.wait()
+    errors = queue.pop_errors()
+    if errors:
+        raise Exception(f"{len(errors)} export(s) failed:\n" + "\n".join(errors))
+
+
+def _report_errors(errors: list):
+    for error in errors:
+        warnings.warn(f"obsidianize export failed: {error}", stacklevel=3)
+
+
+def export(description: str, snapshot, function, *args):
+    """
+    Function to run an export, in the background if the asynchronous export is enabled.
+    :param description: str: what is exported, used in the error messages
+    :param snapshot: callable: function returning a copy of the object to export, taken now so that later changes made
+    by the notebook do not end up in the asset (None if the object can be exported as is)
+    :param function: callable: the export function, called with the snapshot (or the object) and args
+    :param args: the object to export, then the other arguments of the export function
+    :return: nothing
+    """
+    queue = _queue
+    if queue is None:
+        function(*args)
+        return
+    # Report the errors of the previous exports in the cell running now
+    _report_errors(queue.pop_errors())
+
+    obj, *rest = args
+    if snapshot is not None:
+        try:
+            obj = snapshot(obj)
+        except Exception:
+            # The object cannot be copied, export it now
+            function(*args)
+            return
+    queue.submit(description, function, obj, *rest)
+
+
+class _FigurePickler(pickle.Pickler):
+    """
+    Pickler copying matplotlib figures without registering the copies with pyplot (which would display them again).
+    """
+
+    def reducer_override(self, obj):
+        from matplotlib.figure import Figure
+
+        if type(obj) is Figure:
+            state = obj.__getstate__()
+            state.pop("_restore_to_pylab", None)
+            return _new_figure, (), state
+        return NotImplemented
+
+
+def _new_figure():
+    from matplotlib.figure import Figure
+
+    return Figure.__new__(Figure)
+
+
+def snapshot_pyplot(figure):
+    """
+    Function to copy a matplotlib figure, detached from pyplot.
+    :param figure: matplotlib.figure.Figure: the figure
+    :return: matplotlib.figure.Figure: the copy
+    """
+    buffer = io.BytesIO()
+    _FigurePickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(figure)
+    return pickle.loads(buffer.getvalue())
+
+
+def snapshot_plotly(fig):
+    """
+    Function to copy a plotly figure.
+    :param fig: plotly.graph_objs.Figure: the figure
+    :return: dict: the figure as a dictionary (accepted by plotly.io)
+    """
+    return fig.to_dict()
+
+
+def snapshot_pandas(df):
+    """
+    Function to copy a pandas dataframe.
+    :param df: pd.DataFrame: the dataframe
+    :return: pd.DataFrame: the copy
+    """
+    return df.copy(deep=True)
@@ -0,0 +1,65 @@
+"""
+This file contains the content fingerprints used to skip the export of assets that did not change.
+Before exporting an asset, the placeholder functions compute a cheap fingerprint of its content (the JSON of a plotly
+figure, the rendered PNG of a matplotlib figure, the hash of a dataframe) and compare it with the one recorded
+when the asset was last exported (see the asset manifest). When they match and the files are still there, the export
+is skipped.
+"""
+import hashlib
+import io
+
+
+def _digest(*parts) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def render_pyplot(figure) -> tuple:
+    """
+    Function to render a matplotlib figure to PNG and compute its fingerprint from the PNG. The PNG is the asset
+    exported, so the figure is rendered once whether the export is skipped or not.
+    :param figure: matplotlib.figure.Figure: the figure
+    :return: tuple: (png, fingerprint) with png the bytes of the rendered figure, or (None, None) if it cannot be
+    rendered
+    """
+    try:
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format="png")
+    except Exception:
+        return None, None
+    png = buffer.getvalue()
+    return png, _digest("pyplot", png)
+
+
+def fingerprint_plotly(fig, *options):
+    """
+    Function to compute the fingerprint of a plotly figure, from its JSON.
+    :param fig: plotly.graph_objs.Figure: the figure
+    :param options: the export options that change the files written
+    :return: str: the fingerprint, or None if it cannot be computed
+    """
+    try:
+        import plotly.io as pio
+
+        return _digest("plotly", options, pio.to_json(fig, validate=False, remove_uids=False))
+    except Exception:
+        return None
+
+
+def fingerprint_pandas(df, *options):
+    """
+    Function to compute the fingerprint of a pandas dataframe, with pd.util.hash_pandas_object.
+    :param df: pd.DataFrame: the dataframe
+    :param options: the export options that change the files written
+    :return: str: the fingerprint, or None if it cannot be computed (e.g. unhashable values)
+    """
+    try:
+        import pandas as pd
+
+        row_hashes = pd.util.hash_pandas_object(df, index=True).values
+        # hash_pandas_object ignores the column labels and dtypes
+        return _digest("pandas", options, df.shape, list(df.columns), list(df.dtypes.astype(str)), row_hashes.tobytes())
+    except Exception:
+        return None
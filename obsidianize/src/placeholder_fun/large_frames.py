@@ -0,0 +1,147 @@
+"""
+This file contains the export policy of the large dataframes.
+A dataframe with more rows or columns than the limits is not written to markdown in full (which takes minutes for
+millions of rows and produces a file Obsidian cannot open): the markdown asset is a bounded preview, linking to a side
+file holding the full data. The side file is written in chunks of rows, so that the memory used does not grow with the
+size of the dataframe.
+"""
+import os
+
+PREVIEW_MODES = ("head_tail", "sample", "head")
+SIDE_FORMATS = ("parquet", "feather", "csv")
+# Extensions of the side files, in the order view_pandas looks for them
+SIDE_FILE_EXTENSIONS = SIDE_FORMATS
+CHUNK_ROWS = 100_000
+
+
+def is_large(df, max_rows: int, max_cols: int) -> bool:
+    """
+    Function to check whether a dataframe exceeds the preview limits.
+    :param df: pd.DataFrame: the dataframe
+    :param max_rows: int: the maximum number of rows written to markdown (None for no limit)
+    :param max_cols: int: the maximum number of columns written to markdown (None for no limit)
+    :return: bool: True if the dataframe should be exported as a preview and a side file
+    """
+    rows, cols = df.shape
+    return (max_rows is not None and rows > max_rows) or (max_cols is not None and cols > max_cols)
+
+
+def make_preview(df, max_rows: int, max_cols: int, mode: str = "head_tail"):
+    """
+    Function to select the part of a dataframe written to the markdown preview.
+    :param df: pd.DataFrame: the dataframe
+    :param max_rows: int: the maximum number of rows of the preview (None for no limit)
+    :param max_cols: int: the maximum number of columns of the preview (None for no limit), the first ones are kept
+    :param mode: str: "head_tail" (first and last rows), "sample" (random rows, in their original order) or "head"
+    (first rows)
+    :return: pd.DataFrame: the preview
+    """
+    import pandas as pd
+
+    if mode not in PREVIEW_MODES:
+        raise ValueError(f"preview should be one of {', '.join(PREVIEW_MODES)}")
+    if max_cols is not None and df.shape[1] > max_cols:
+        df = df.iloc[:, :max_cols]
+    if max_rows is None or len(df) <= max_rows:
+        return df
+    if mode == "head":
+        return df.head(max_rows)
+    if mode == "sample":
+        positions = sorted(pd.Series(range(len(df))).sample(n=max_rows, random_state=0))
+        return df.iloc[positions]
+    head_rows = (max_rows + 1) // 2
+    return pd.concat([df.head(head_rows), df.tail(max_rows - head_rows)])
+
+
+def get_side_format(side_format: str = "auto") -> str:
+    """
+    Function to pick the format of the side file.
+    :param side_format: str: "parquet", "feather" or "csv", or "auto" for parquet when pyarrow is installed and csv
+    otherwise
+    :return: str: the format
+    """
+    if side_format == "auto":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return "csv"
+        return "parquet"
+    if side_format not in SIDE_FORMATS:
+        raise ValueError(f"side_format should be one of auto, {', '.join(SIDE_FORMATS)}")
+    return side_format
+
+
+def get_side_file_path(assets_folder: str, dataframe_title: str, side_format: str) -> str:
+    """
+    Function to get the path to the side file of a dataframe.
+    :param assets_folder: str: the path to the assets folder
+    :param dataframe_title: str: the sanitized title of the dataframe
+    :param side_format: str: the format of the side file
+    :return: str: the path to the side file
+    """
+    return os.path.join(assets_folder, f"{dataframe_title}.{side_format}")
+
+
+def write_side_file(df, path: str, side_format: str, chunk_rows: int = CHUNK_ROWS):
+    """
+    Function to write the full data of a dataframe to its side file, chunk by chunk.
+    The file is written next to its final path then moved, so that an interrupted export does not leave a truncated
+    file behind.
+    :param df: pd.DataFrame: the dataframe
+    :param path: str: the path to the side file
+    :param side_format: str: "parquet", "feather" or "csv"
+    :param chunk_rows: int: the number of rows converted at once
+    :return: nothing
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    chunks = (df.iloc[start:start + chunk_rows] for start in range(0, max(len(df), 1), chunk_rows))
+    try:
+        if side_format == "csv":
+            with open(tmp_path, "w", newline="") as f:
+                for index, chunk in enumerate(chunks):
+                    chunk.to_csv(f, header=index == 0)
+        else:
+            _write_arrow_chunks(chunks, tmp_path, side_format)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write_arrow_chunks(chunks, path: str, side_format: str):
+    import pyarrow as pa
+
+    writer = None
+    schema = None
+    try:
+        for chunk in chunks:
+            # Arrow needs string column names, the first chunk fixes the schema of the file
+            chunk = chunk.rename(columns=str)
+            if writer is None:
+                table = pa.Table.from_pandas(chunk)
+                schema = table.schema
+                if side_format == "parquet":
+                    import pyarrow.parquet as pq
+
+                    writer = pq.ParquetWriter(path, table.schema)
+                else:
+                    writer = pa.ipc.new_file(path, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def preview_note(df, preview, side_name: str) -> str:
+    """
+    Function to write the note added under a markdown preview, linking to the side file.
+    :param df: pd.DataFrame: the full dataframe
+    :param preview: pd.DataFrame: the preview
+    :param side_name: str: the file name of the side file (in the same folder as the preview)
+    :return: str: the note, in markdown
+    """
+    rows, cols = df.shape
+    return (f"\n\n*Preview of {len(preview)} of {rows} rows and {preview.shape[1]} of {cols} columns, "
+            f"full data: [{side_name}]({side_name})*\n")
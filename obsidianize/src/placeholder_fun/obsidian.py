@@ -1,4 +1,7 @@
 import os
+import threading
+import time
+from collections import defaultdict
 
 import matplotlib
 import numpy as np
@@ -6,10 +9,23 @@ import pandas as pd
 import plotly
 from matplotlib import pyplot as plt
 
-from obsidianize.src.utils.path_utils import get_notebook_path, get_assets_path, in_obsidian_env
+from obsidianize.src.utils.asset_manifest import get_asset_manifest
+from obsidianize.src.utils.path_utils import get_notebook_path, get_assets_path, get_repo_path, in_obsidian_env
 from obsidianize.src.utils.sanitize import sanitize_name
+from obsidianize.src.placeholder_fun.plotly_export import get_plotly_renderer
+from obsidianize.src.placeholder_fun.export_queue import export, snapshot_pyplot, snapshot_plotly, snapshot_pandas
+from obsidianize.src.placeholder_fun.fingerprint import render_pyplot, fingerprint_plotly, fingerprint_pandas
+from obsidianize.src.placeholder_fun.large_frames import (SIDE_FILE_EXTENSIONS, is_large, make_preview, get_side_format,
+                                                          get_side_file_path, write_side_file, preview_note)
 from IPython.display import display
 
+# Time spent by the placeholders resolving the notebook, its assets folder and the title of the display, by display
+# type (the display itself and the export are not included)
+_overhead = defaultdict(lambda: {"count": 0, "total": 0.0})
+_overhead_lock = threading.Lock()
+# Exports skipped because the fingerprint of the asset did not change (hits) and exports done (misses), by display type
+_export_stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+
 
 def obsidian_pyplot(
         figure: matplotlib.figure.Figure,
@@ -26,6 +42,7 @@ def obsidian_pyplot(
     / JupyterLab / VSCode / Jetbrains IDEs
     :return: None
     """
+    start = time.perf_counter()
     # Check if there is a figure
     if figure is None:
         raise ValueError("Please provide a figure to display")
@@ -38,20 +55,18 @@ def obsidian_pyplot(
 
     # Get the corresponding assets folder
     assets_folder = get_assets_path(path_to_notebook)
+    manifest = get_asset_manifest(get_repo_path(assets_folder))
     print(assets_folder)
     # Get the figure title
     figure_title = sanitize_name(title)
 
-    # If the figure title is None, go to the assets folder to figure out the display counter for this type of figure
+    # If the figure title is None, count the displays of this type
     if figure_title is None:
-        counter = 0
-        # Check for all the files in the assets folder
-        for file in os.listdir(assets_folder):
-            # If the file is a pyplot figure, increment the counter
-            if "pyplot" in file:
-                counter += 1
+        # The asset manifest counts the pyplot exports of the folder without listing it
+        counter = manifest.count(assets_folder, "pyplot")
         # Set the figure title to the counter
         figure_title = f"pyplot'_{counter}"
+    _record_overhead("pyplot", start)
 
     # Get the figure number
     figure_number = figure.number
@@ -59,20 +74,35 @@ def obsidian_pyplot(
     plt.figure(figure_number)
     # Set the title of the figure
     plt.title(title)
+    # Render the figure before it is displayed (and possibly closed), the PNG is both fingerprinted and exported
+    png, fingerprint = render_pyplot(figure)
+    path = os.path.join(assets_folder, f"{figure_title}.png")
 
     # Check if we're in the obsidian code execution environment
     if not in_obsidian_env():
         plt.show(figure)
-    # In all cases, save the figure
-    figure.savefig(os.path.join(assets_folder, f"{figure_title}.png"))
+    # In all cases, save the figure (in the background if the asynchronous export is enabled), unless it did not change
+    if manifest.matches(path, fingerprint, [path]):
+        _record_export("pyplot", hit=True)
+        return
+    _record_export("pyplot", hit=False)
+    record = (manifest, path_to_notebook, "pyplot", figure_title, fingerprint)
+    if png is None:
+        # Let savefig raise the rendering error (in the background if the asynchronous export is enabled)
+        export(f"{figure_title}.png", snapshot_pyplot, _save_pyplot, figure, path, record)
+    else:
+        export(f"{figure_title}.png", None, _write_png, png, path, record)
 
 
 def obsidian_pandas(
         df: pd.DataFrame,
         title: str,
         path_to_notebook: str = None,
-        format: str = "markdown"
-
+        format: str = "markdown",
+        max_rows: int = 1000,
+        max_cols: int = 50,
+        preview: str = "head_tail",
+        side_format: str = "auto",
 ):
     """
     Function to display a pandas dataframe in Obsidian. Replace your usual `print(df)` with this function to display
@@ -84,8 +114,16 @@ def obsidian_pandas(
     / JupyterLab / VSCode / Jetbrains IDEs
     :param format: str: the format to display the dataframe in (either "markdown" or "latex") ("latex" is broken for
     display in obsidian, either way the dataframe is saved in a .tex file)
+    :param max_rows: int: the maximum number of rows written to markdown (1000 by default, None for no limit). Larger
+    dataframes are written as a markdown preview linking to a side file holding the full data, so a dataframe that was
+    written in full by a previous version becomes a preview: give max_rows=None and max_cols=None to keep it in full
+    :param max_cols: int: the maximum number of columns written to markdown (50 by default, None for no limit)
+    :param preview: str: the rows of the preview, "head_tail" (default), "sample" or "head"
+    :param side_format: str: the format of the side file, "parquet", "feather" or "csv" ("auto" by default: parquet
+    if pyarrow is installed, csv otherwise)
     :return: None
     """
+    start = time.perf_counter()
     # Check if there is a dataframe
     if df is None:
         raise ValueError("Please provide a dataframe to display")
@@ -98,21 +136,18 @@ def obsidian_pandas(
 
     # Get the corresponding assets folder
     assets_folder = get_assets_path(path_to_notebook)
+    manifest = get_asset_manifest(get_repo_path(assets_folder))
 
     # Get the dataframe title
     dataframe_title = sanitize_name(title)
 
     if dataframe_title is None:
-        # If the dataframe title is None, go to the assets folder to figure out the display counter for this type of
-        # figure
-        counter = 0
-        # Check for all the files in the assets folder
-        for file in os.listdir(assets_folder):
-            # If the file is a pandas dataframe, increment the counter
-            if "pandas" in file:
-                counter += 1
+        # If the dataframe title is None, count the displays of this type
+        # The asset manifest counts the pandas exports of the folder without listing it
+        counter = manifest.count(assets_folder, "pandas")
         # Set the dataframe title to the counter
         dataframe_title = f"pandas_{counter}"
+    _record_overhead("pandas", start)
 
     # Check if we're in the obsidian code execution environment
     if not in_obsidian_env():
@@ -125,7 +160,34 @@ def obsidian_pandas(
     # We are saving it to a Latex formating for better display in Obsidian
     print(os.path.join(assets_folder, f"{dataframe_title}.tex"))
     # df.to_latex(os.path.join(assets_folder, f"{dataframe_title}.tex"), caption=title, label=title)
-    df.to_markdown(os.path.join(assets_folder, f"{dataframe_title}.md"))
+    path = os.path.join(assets_folder, f"{dataframe_title}.md")
+    files = [path]
+    large = is_large(df, max_rows, max_cols)
+    if large:
+        # Only a preview goes to markdown, the full data goes to a side file
+        side_format = get_side_format(side_format)
+        side_path = get_side_file_path(assets_folder, dataframe_title, side_format)
+        files.append(side_path)
+        fingerprint = fingerprint_pandas(df, max_rows, max_cols, preview, side_format)
+    else:
+        side_path = None
+        fingerprint = fingerprint_pandas(df)
+    if manifest.matches(path, fingerprint, files):
+        _record_export("pandas", hit=True)
+        return
+    _record_export("pandas", hit=False)
+    _remove_side_files(assets_folder, dataframe_title, keep=side_path)
+    record = (manifest, path_to_notebook, "pandas", dataframe_title, fingerprint)
+    if not large:
+        export(f"{dataframe_title}.md", snapshot_pandas, _save_pandas, df, path, files, record)
+        return
+    # The full data is written now, chunk by chunk, so that the dataframe is never copied
+    write_side_file(df, side_path, side_format)
+    preview_df = make_preview(df, max_rows, max_cols, preview)
+    note = preview_note(df, preview_df, os.path.basename(side_path))
+    print(f"{title} is larger than {max_rows} rows or {max_cols} columns, only a preview is written to markdown "
+          f"(full data in {side_path}, max_rows=None and max_cols=None to write it in full)")
+    export(f"{dataframe_title}.md", snapshot_pandas, _save_pandas, preview_df, path, files, record, note)
 
 
 def obsidian_plotly(
@@ -148,6 +210,7 @@ def obsidian_plotly(
     :param html: bool: whether to save the figure in html format (by default True)
     :return: None
     """
+    start = time.perf_counter()
     # Check if there is a figure
     if fig is None:
         raise ValueError("Please provide a figure to display")
@@ -160,20 +223,18 @@ def obsidian_plotly(
 
     # Get the corresponding assets folder
     assets_folder = get_assets_path(path_to_notebook)
+    manifest = get_asset_manifest(get_repo_path(assets_folder))
 
     # Get the figure title
     figure_title = sanitize_name(title)
 
-    # If the figure title is None, go to the assets folder to figure out the display counter for this type of figure
+    # If the figure title is None, count the displays of this type
     if figure_title is None:
-        counter = 0
-        # Check for all the files in the assets folder
-        for file in os.listdir(assets_folder):
-            # If the file is a plotly figure, increment the counter
-            if "plotly" in file:
-                counter += 1
+        # The asset manifest counts the plotly exports of the folder without listing it
+        counter = manifest.count(assets_folder, "plotly")
         # Set the figure title to the counter
         figure_title = f"plotly'_{counter}"
+    _record_overhead("plotly", start)
 
     # Check if we're in the obsidian code execution environment
     if not in_obsidian_env():
@@ -182,9 +243,95 @@ def obsidian_plotly(
         # Display the figure
         fig.show()
 
-    # In all cases, save the figure
-    if svg:
-        fig.write_image(os.path.join(assets_folder, f"{figure_title}.svg"))
+    # In all cases, save the figure (in the background if the asynchronous export is enabled), unless it did not change
+    fingerprint = fingerprint_plotly(fig, svg, html)
+    extensions = ["png"] + (["svg"] if svg else []) + (["html"] if html else [])
+    paths = [os.path.join(assets_folder, f"{figure_title}.{extension}") for extension in extensions]
+    if manifest.matches(paths[0], fingerprint, paths):
+        _record_export("plotly", hit=True)
+        return
+    _record_export("plotly", hit=False)
+    record = (manifest, path_to_notebook, "plotly", figure_title, fingerprint)
+    export(f"{figure_title}.png", snapshot_plotly, _save_plotly, fig, paths, svg, html, record)
+
+
+def get_placeholder_overhead() -> dict:
+    """
+    Function to get the time spent by the placeholder functions outside of the display and the export (detecting the
+    notebook, resolving its assets folder and the title), by display type.
+    :return: dict: {display type: {"count": int, "total": float seconds, "mean": float seconds}}
+    """
+    with _overhead_lock:
+        return {display_type: dict(timing, mean=timing["total"] / timing["count"])
+                for display_type, timing in _overhead.items()}
+
+
+def get_export_stats() -> dict:
+    """
+    Function to get the number of exports skipped because the content of the asset did not change (hits), and of
+    exports done (misses), by display type.
+    :return: dict: {display type: {"hits": int, "misses": int}}
+    """
+    with _overhead_lock:
+        return {display_type: dict(stats) for display_type, stats in _export_stats.items()}
+
+
+def _record_export(display_type: str, hit: bool):
+    with _overhead_lock:
+        _export_stats[display_type]["hits" if hit else "misses"] += 1
+
+
+def _record_overhead(display_type: str, start: float):
+    seconds = time.perf_counter() - start
+    with _overhead_lock:
+        _overhead[display_type]["count"] += 1
+        _overhead[display_type]["total"] += seconds
+
+
+def _record(files: list, record: tuple):
+    # Record the export in the asset manifest, once all its files are written
+    manifest, notebook, display_type, title, fingerprint = record
+    manifest.record(files[0], files, os.path.abspath(notebook), display_type, title, fingerprint)
+
+
+def _save_pyplot(figure, path: str, record: tuple):
+    figure.savefig(path)
+    _record([path], record)
+
+
+def _write_png(png: bytes, path: str, record: tuple):
+    with open(path, "wb") as f:
+        f.write(png)
+    _record([path], record)
+
+
+def _save_pandas(df, path: str, files: list, record: tuple, note: str = None):
+    df.to_markdown(path)
+    if note is not None:
+        # The dataframe is a preview, link it to its side file
+        with open(path, "a") as f:
+            f.write(note)
+    _record(files, record)
+
+
+def _remove_side_files(assets_folder: str, dataframe_title: str, keep: str = None):
+    # Remove the side files left by a previous export of the dataframe (when it was larger, or in another format)
+    for extension in SIDE_FILE_EXTENSIONS:
+        side_path = get_side_file_path(assets_folder, dataframe_title, extension)
+        if side_path != keep and os.path.exists(side_path):
+            os.remove(side_path)
+
+
+def _save_plotly(fig, paths: list, svg: bool, html: bool, record: tuple):
+    # fig is either a plotly figure or its snapshot (a dict), the renderer accepts both
+    # paths are the .png, then the .svg and .html files if they are enabled
+    stem = os.path.splitext(paths[0])[0]
+    renderer = get_plotly_renderer()
+    formats = ["svg", "png"] if svg else ["png"]
+    images = renderer.render(fig, formats)
+    for image_format, image in images.items():
+        with open(f"{stem}.{image_format}", "wb") as f:
+            f.write(image)
     if html:
-        fig.write_html(os.path.join(assets_folder, f"{figure_title}.html"), auto_open=False)
-    fig.write_image(os.path.join(assets_folder, f"{figure_title}.png"))
+        renderer.write_html(fig, f"{stem}.html")
+    _record(paths, record)
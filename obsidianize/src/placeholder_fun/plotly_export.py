@@ -0,0 +1,184 @@
+"""
+This file contains the plotly export engine used by obsidian_plotly.
+plotly.io.write_image serializes the figure to JSON and sends it to the Kaleido subprocess once per format. The
+renderer validates and serializes the figure once, then sends the requests for all the static formats in one batch to
+the long-lived Kaleido scope shared by the whole kernel session, and reads the images back in order.
+The batch goes through internals of the Kaleido scope, with the Kaleido versions that do not have all of them the
+figure is exported once per format through plotly's public API instead.
+Per-format timings are recorded, see get_plotly_timings().
+"""
+import base64
+import io
+import json
+import threading
+import time
+from collections import defaultdict
+
+_TEXT_FORMATS = {"svg", "json", "eps"}
+# Attributes of the Kaleido scope the batched renderer uses
+_SCOPE_ATTRIBUTES = (
+    "_ensure_kaleido", "_proc", "_proc_lock", "_json_dumps", "_std_error", "_get_decoded_std_error", "default_width",
+    "default_height", "default_scale",
+)
+
+
+class PlotlyRenderer:
+    """
+    Renderer of plotly figures to several static formats with a single serialization and a single round trip to
+    Kaleido.
+    """
+
+    def __init__(self):
+        self.timings = defaultdict(lambda: {"count": 0, "total": 0.0})
+        self.timings_lock = threading.Lock()
+
+    def _record(self, stage: str, seconds: float):
+        with self.timings_lock:
+            self.timings[stage]["count"] += 1
+            self.timings[stage]["total"] += seconds
+
+    @staticmethod
+    def _get_scope():
+        """
+        Function to get the Kaleido scope of plotly, if it is a Kaleido version this renderer can talk to.
+        :return: the scope, or None
+        """
+        try:
+            from plotly.io._kaleido import scope
+        except ImportError:
+            return None
+        if scope is None or not all(hasattr(scope, name) for name in _SCOPE_ATTRIBUTES):
+            return None
+        return scope
+
+    def _render_each(self, fig_dict: dict, formats: list) -> dict:
+        """
+        Function to render a figure to several static formats, one call to plotly per format.
+        :param fig_dict: dict: the validated figure
+        :param formats: list: the formats to render
+        :return: dict: the image bytes, by format
+        """
+        import plotly.io as pio
+
+        images = {}
+        for image_format in formats:
+            start = time.perf_counter()
+            images[image_format] = pio.to_image(fig_dict, format=image_format, validate=False)
+            self._record(image_format, time.perf_counter() - start)
+        return images
+
+    def render(self, fig, formats: list) -> dict:
+        """
+        Function to render a figure to several static formats.
+        :param fig: plotly.graph_objs.Figure or dict: the figure
+        :param formats: list: the formats to render (e.g. ["svg", "png"])
+        :return: dict: the image bytes, by format
+        """
+        from plotly.io._utils import validate_coerce_fig_to_dict
+
+        start = time.perf_counter()
+        fig_dict = validate_coerce_fig_to_dict(fig, True)
+        self._record("validate", time.perf_counter() - start)
+
+        scope = self._get_scope()
+        if scope is None:
+            # Other Kaleido versions: one call per format, through plotly
+            return self._render_each(fig_dict, formats)
+
+        # Serialize the figure once for all the formats
+        start = time.perf_counter()
+        data_json = scope._json_dumps(fig_dict)
+        layout = fig_dict.get("layout", {})
+        width = layout.get("width") or layout.get("template", {}).get("layout", {}).get("width") or scope.default_width
+        height = (layout.get("height") or layout.get("template", {}).get("layout", {}).get("height")
+                  or scope.default_height)
+        requests = []
+        for image_format in formats:
+            spec = json.dumps({"format": image_format, "width": width, "height": height, "scale": scope.default_scale})
+            requests.append(f'{spec[:-1]}, "data": {data_json}}}\n'.encode("utf-8"))
+        self._record("serialize", time.perf_counter() - start)
+
+        scope._ensure_kaleido()
+        if not all(hasattr(scope._proc, name) for name in ("stdin", "stdout")):
+            return self._render_each(fig_dict, formats)
+        responses = []
+        with scope._proc_lock:
+            scope._std_error = io.BytesIO()
+            # Write the requests from another thread, so that a large response cannot block Kaleido while we write
+            writer = threading.Thread(target=self._write_requests, args=(scope._proc.stdin, requests))
+            start = time.perf_counter()
+            writer.start()
+            for image_format in formats:
+                responses.append(scope._proc.stdout.readline())
+                now = time.perf_counter()
+                self._record(image_format, now - start)
+                start = now
+            writer.join()
+
+        images = {}
+        for image_format, response in zip(formats, responses):
+            if not response:
+                raise ValueError("Transform failed. Error stream:\n\n" + scope._get_decoded_std_error())
+            response = json.loads(response.decode("utf-8"))
+            if response.get("code", 0) != 0:
+                raise ValueError(f"Transform failed with error code {response.get('code')}: {response.get('message')}")
+            image = response.get("result").encode("utf-8")
+            if image_format not in _TEXT_FORMATS:
+                image = base64.b64decode(image)
+            images[image_format] = image
+        return images
+
+    @staticmethod
+    def _write_requests(stream, requests: list):
+        for request in requests:
+            stream.write(request)
+        stream.flush()
+
+    def write_html(self, fig, path: str):
+        """
+        Function to write a figure as an interactive html file.
+        :param fig: plotly.graph_objs.Figure or dict: the figure
+        :param path: str: the path to the html file
+        :return: nothing
+        """
+        import plotly.io as pio
+
+        start = time.perf_counter()
+        pio.write_html(fig, path, auto_open=False)
+        self._record("html", time.perf_counter() - start)
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_plotly_renderer() -> PlotlyRenderer:
+    """
+    Function to get the plotly renderer shared by the kernel session.
+    :return: PlotlyRenderer: the renderer
+    """
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = PlotlyRenderer()
+        return _renderer
+
+
+def get_plotly_timings() -> dict:
+    """
+    Function to get the time spent exporting plotly figures, by stage (validate, serialize) and by format.
+    :return: dict: {stage: {"count": int, "total": float seconds}}
+    """
+    renderer = get_plotly_renderer()
+    with renderer.timings_lock:
+        return {stage: dict(timing) for stage, timing in renderer.timings.items()}
+
+
+def reset_plotly_timings():
+    """
+    Function to reset the plotly export timings.
+    :return: nothing
+    """
+    renderer = get_plotly_renderer()
+    with renderer.timings_lock:
+        renderer.timings.clear()
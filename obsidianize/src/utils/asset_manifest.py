@@ -0,0 +1,188 @@
+"""
+This file contains the asset manifest, the index of the assets exported by the placeholder functions.
+The manifest is a SQLite database stored per repository (in assets/.obsidianize.sqlite, next to the assets it indexes)
+and records, for each export, the notebook it belongs to, its display type, title and content fingerprint, and for each
+file written, its size and content hash. The display counters are indexed lookups instead of scans of the assets folder,
+and the files no markdown file references any more can be found without guessing (see obsidianize gc).
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from obsidianize.src.utils.manifest import hash_file
+
+ASSET_MANIFEST_NAME = ".obsidianize.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS exports (
+    name TEXT PRIMARY KEY,
+    notebook TEXT,
+    folder TEXT NOT NULL,
+    type TEXT,
+    title TEXT,
+    fingerprint TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS exports_folder_type ON exports (folder, type);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    export TEXT NOT NULL,
+    size INTEGER,
+    hash TEXT
+);
+CREATE INDEX IF NOT EXISTS files_export ON files (export);
+"""
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+class AssetManifest:
+    """
+    Persistent index of the assets of a repository.
+    The paths are stored relative to the repository root. An export is identified by its main file (e.g. the .png of a
+    plotly figure), and owns all the files written for it (e.g. the .png, .svg and .html of a plotly figure).
+    """
+
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+        self.path = os.path.join(repo_path, "assets", ASSET_MANIFEST_NAME)
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # The connection is shared by the threads of the asynchronous export queue, under self.lock
+        self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.executescript(_SCHEMA)
+
+    def _key(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.repo_path)
+
+    def count(self, folder: str, display_type: str) -> int:
+        """
+        Function to count the exports of a display type in an assets folder (used to number the untitled displays).
+        :param folder: str: the path to the assets folder
+        :param display_type: str: the display type ("pyplot", "plotly" or "pandas")
+        :return: int: the number of exports recorded
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT COUNT(*) FROM exports WHERE folder = ? AND type = ?", (self._key(folder), display_type)
+            ).fetchone()
+        return row[0]
+
+    def matches(self, name: str, fingerprint, files: list) -> bool:
+        """
+        Function to check whether an export is up to date.
+        :param name: str: the path to the main file of the export
+        :param fingerprint: str: the fingerprint of the content to export (None always misses)
+        :param files: list: the paths of the files the export writes
+        :return: bool: True if the export can be skipped
+        """
+        if fingerprint is None:
+            return False
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT fingerprint FROM exports WHERE name = ?", (self._key(name),)
+            ).fetchone()
+        if row is None or row[0] != fingerprint:
+            return False
+        return all(os.path.exists(file) for file in files)
+
+    def record(self, name: str, files: list, notebook: str, display_type: str, title: str, fingerprint):
+        """
+        Function to record an export that has just been written.
+        :param name: str: the path to the main file of the export
+        :param files: list: the paths of the files written
+        :param notebook: str: the path to the notebook the export belongs to
+        :param display_type: str: the display type ("pyplot", "plotly" or "pandas")
+        :param title: str: the sanitized title of the display
+        :param fingerprint: str: the fingerprint of the content exported (None if it could not be computed)
+        :return: nothing
+        """
+        key = self._key(name)
+        rows = []
+        for file in files:
+            rows.append((self._key(file), key, os.path.getsize(file), hash_file(file)))
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM files WHERE export = ?", (key,))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO exports VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, self._key(notebook), self._key(os.path.dirname(name)), display_type, title, fingerprint,
+                 time.time()),
+            )
+            self.connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", rows)
+
+    def forget(self, paths: list):
+        """
+        Function to remove files from the manifest, and the exports left without files.
+        :param paths: list: the paths to the files
+        :return: nothing
+        """
+        keys = [(self._key(path),) for path in paths]
+        with self.lock, self.connection:
+            self.connection.executemany("DELETE FROM files WHERE path = ?", keys)
+            self.connection.executemany("DELETE FROM exports WHERE name = ?", keys)
+            self.connection.execute("DELETE FROM exports WHERE name NOT IN (SELECT export FROM files)")
+
+    def get_notebook_files(self, notebook: str) -> list:
+        """
+        Function to list the files exported for a notebook.
+        :param notebook: str: the path to the notebook
+        :return: list: the absolute paths of the files
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT files.path FROM files JOIN exports ON files.export = exports.name WHERE exports.notebook = ?",
+                (self._key(notebook),),
+            ).fetchall()
+        return [os.path.join(self.repo_path, path) for path, in rows]
+
+    def move_notebook(self, old_notebook: str, new_notebook: str, moved_files: dict = None):
+        """
+        Function to update the manifest after a notebook has been renamed, and its files possibly moved.
+        :param old_notebook: str: the previous path to the notebook
+        :param new_notebook: str: the new path to the notebook
+        :param moved_files: dict: the new paths of the files that have been moved, by previous path
+        :return: nothing
+        """
+        moved = [(self._key(old_path), self._key(new_path)) for old_path, new_path in (moved_files or {}).items()]
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE exports SET notebook = ? WHERE notebook = ?", (self._key(new_notebook), self._key(old_notebook))
+            )
+            for old_key, new_key in moved:
+                self.connection.execute("UPDATE OR REPLACE files SET path = ? WHERE path = ?", (new_key, old_key))
+                self.connection.execute("UPDATE files SET export = ? WHERE export = ?", (new_key, old_key))
+                self.connection.execute(
+                    "UPDATE OR REPLACE exports SET name = ?, folder = ? WHERE name = ?",
+                    (new_key, os.path.dirname(new_key), old_key),
+                )
+
+    def iter_files(self):
+        """
+        Function to list the files recorded in the manifest.
+        :return: list: tuples (absolute path, main file of the export, size, hash)
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT path, export, size, hash FROM files").fetchall()
+        return [(os.path.join(self.repo_path, path), export, size, content_hash)
+                for path, export, size, content_hash in rows]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def get_asset_manifest(repo_path: str) -> AssetManifest:
+    """
+    Function to get the asset manifest of a repository, shared by the whole process.
+    :param repo_path: str: the path to the repository
+    :return: AssetManifest: the manifest
+    """
+    repo_path = os.path.abspath(repo_path)
+    with _manifests_lock:
+        manifest = _manifests.get(repo_path)
+        if manifest is None:
+            manifest = _manifests[repo_path] = AssetManifest(repo_path)
+        return manifest
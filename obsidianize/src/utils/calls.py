@@ -0,0 +1,153 @@
+"""
+This file contains the detection of the obsidian_* calls in the code cells.
+A code cell is parsed once with ast, which finds every obsidian_pyplot / obsidian_plotly / obsidian_pandas call with
+its title, including keyword arguments, calls spread over several lines and nested parentheses. The results are kept in
+a bounded LRU cache keyed by the hash of the cell source, so an unchanged cell is never parsed twice in a process.
+Cells that are not valid Python (e.g. cell magics) are handled line by line with a regular expression instead.
+"""
+import ast
+import hashlib
+import re
+import threading
+import warnings
+from collections import OrderedDict, namedtuple
+
+from obsidianize.src.utils.sanitize import sanitize_name, get_figure_title
+
+ObsidianCall = namedtuple("ObsidianCall", ["display_type", "title", "lineno"])
+
+CALL_CACHE_SIZE = 4096
+_CALL_PREFIX = "obsidian_"
+_CALL_RE = re.compile(r"obsidian_(\w+)\(")
+# IPython syntax that is not valid Python: line magics, shell escapes and help requests
+_IPYTHON_LINE_RE = re.compile(r"^\s*[%!?]|^\s*[\w.]+\?{1,2}\s*$|^\s*[\w.]+\s*=\s*[!%]")
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _get_call_name(node: ast.Call):
+    """
+    Function to get the name of the function called, for obsidian_x(...) and module.obsidian_x(...) calls.
+    :param node: ast.Call: the call node
+    :return: str: the name of the function called, or None
+    """
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+def _resolve_title(node: ast.Call, source: str):
+    """
+    Function to get the sanitized title given to an obsidian_* call.
+    :param node: ast.Call: the call node
+    :param source: str: the source of the cell
+    :return: str: the title, or None if no title is given
+    """
+    title_node = None
+    if len(node.args) > 1:
+        title_node = node.args[1]
+    for keyword in node.keywords:
+        if keyword.arg == "title":
+            title_node = keyword.value
+    if title_node is None:
+        return None
+
+    if isinstance(title_node, ast.Constant) and isinstance(title_node.value, str):
+        return sanitize_name(title_node.value)
+    # The title is an expression (e.g. a variable): use its source, as the line parser did
+    segment = ast.get_source_segment(source, title_node) or ""
+    return sanitize_name(segment.replace("'", "").replace('"', ""))
+
+
+def _parse(source: str):
+    # Invalid escape sequences in the cell would print SyntaxWarnings for every conversion
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return ast.parse(source)
+
+
+def _parse_calls(source: str):
+    """
+    Function to find the obsidian_* calls of a cell with ast.
+    :param source: str: the source of the cell
+    :return: tuple: the ObsidianCall found, in source order, or None if the cell is not valid Python
+    """
+    try:
+        tree = _parse(source)
+    except (SyntaxError, ValueError):
+        tree = None
+    if tree is None:
+        # Blank out the IPython syntax, keeping the line numbers, and try again
+        lines = source.split("\n")
+        if lines and lines[0].lstrip().startswith("%%"):
+            lines[0] = ""
+        source = "\n".join("" if _IPYTHON_LINE_RE.search(line) else line for line in lines)
+        try:
+            tree = _parse(source)
+        except (SyntaxError, ValueError):
+            return None
+
+    calls = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        name = _get_call_name(node)
+        if name is None or not name.startswith(_CALL_PREFIX):
+            continue
+        calls.append((node.lineno, node.col_offset, ObsidianCall(
+            display_type=name[len(_CALL_PREFIX):],
+            title=_resolve_title(node, source),
+            lineno=node.lineno,
+        )))
+    calls.sort(key=lambda call: call[:2])
+    return tuple(call for _, _, call in calls)
+
+
+def _match_calls(source: str):
+    """
+    Function to find the obsidian_* calls of a cell line by line, for cells that are not valid Python.
+    :param source: str: the source of the cell
+    :return: tuple: the ObsidianCall found, in source order
+    """
+    calls = []
+    for lineno, line in enumerate(source.split("\n"), start=1):
+        match = _CALL_RE.search(line)
+        if match:
+            calls.append(ObsidianCall(display_type=match.group(1), title=get_figure_title(line), lineno=lineno))
+    return tuple(calls)
+
+
+def find_obsidian_calls(source: str) -> tuple:
+    """
+    Function to find the obsidian_* calls of a code cell, with their titles.
+    :param source: str: the source of the cell
+    :return: tuple: the ObsidianCall (display_type, title, lineno) found, in source order
+    """
+    key = hashlib.blake2b(source.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _cache_lock:
+        calls = _cache.get(key)
+        if calls is not None:
+            _cache.move_to_end(key)
+            return calls
+
+    calls = _parse_calls(source)
+    if calls is None:
+        calls = _match_calls(source)
+
+    with _cache_lock:
+        _cache[key] = calls
+        if len(_cache) > CALL_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return calls
+
+
+def clear_call_cache():
+    """
+    Function to empty the cache of parsed cells (e.g. to measure cold conversions).
+    :return: nothing
+    """
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,87 @@
+"""
+This file contains the conversion context of a notebook: the paths the view handlers need (repository root, vault root,
+assets folder) are resolved once per notebook instead of once per display.
+"""
+import os
+from pathlib import Path
+
+from obsidianize.src.utils.path_utils import find_ancestor_with
+
+
+class ConversionContext:
+    """
+    Paths related to a notebook being converted, resolved lazily and cached.
+    The repository and vault lookups are themselves cached per folder (see find_ancestor_with), so the notebooks of a
+    batch share them.
+    """
+
+    def __init__(
+            self,
+            notebook_path: str,
+            create_dirs: bool = True,
+            repo_root: str = None,
+            vault_root: str = None,
+            assets_files=None,
+    ):
+        """
+        :param notebook_path: str: the path to the notebook
+        :param create_dirs: bool: create the assets folder of the notebook when it is first needed
+        :param repo_root: str: the root of the git repository containing the notebook (looked up from the notebook
+        path if None)
+        :param vault_root: str: the root of the Obsidian vault containing the notebook (looked up if None)
+        :param assets_files: iterable of str: the names of the files in the assets folder of the notebook (listed if
+        None)
+        """
+        self.notebook_path = os.path.abspath(notebook_path)
+        self.create_dirs = create_dirs
+        self._repo_root = None if repo_root is None else os.path.abspath(repo_root)
+        self._vault_root = None if vault_root is None else os.path.abspath(vault_root)
+        self._assets_folder = None
+        self._assets_link_folder = None
+        self._assets_files = None if assets_files is None else frozenset(assets_files)
+
+    @property
+    def repo_root(self) -> str:
+        """The root of the git repository containing the notebook."""
+        if self._repo_root is None:
+            self._repo_root = find_ancestor_with(os.path.dirname(self.notebook_path), ".git")
+            if self._repo_root is None:
+                raise Exception(".git directory not found, are you sure this is a git repository?")
+        return self._repo_root
+
+    @property
+    def vault_root(self) -> str:
+        """The root of the Obsidian vault containing the notebook."""
+        if self._vault_root is None:
+            self._vault_root = find_ancestor_with(os.path.dirname(self.notebook_path), ".obsidian")
+            if self._vault_root is None:
+                raise Exception(".obsidian directory not found, are you sure this is in an Obsidian vault?")
+        return self._vault_root
+
+    @property
+    def assets_folder(self) -> str:
+        """The absolute path to the assets folder of the notebook (mirroring its folder from the repository root)."""
+        if self._assets_folder is None:
+            relpath_to_notebook = os.path.relpath(os.path.dirname(self.notebook_path), self.repo_root)
+            assets_folder = Path(self.repo_root) / "assets" / relpath_to_notebook
+            if self.create_dirs:
+                assets_folder.mkdir(parents=True, exist_ok=True)
+            self._assets_folder = str(assets_folder)
+        return self._assets_folder
+
+    @property
+    def assets_link_folder(self) -> Path:
+        """The path to the assets folder of the notebook, relative to the vault root, as used in the embeds."""
+        if self._assets_link_folder is None:
+            self._assets_link_folder = Path(self.assets_folder).relative_to(self.vault_root)
+        return self._assets_link_folder
+
+    @property
+    def assets_files(self) -> frozenset:
+        """The names of the files in the assets folder of the notebook, listed once."""
+        if self._assets_files is None:
+            try:
+                self._assets_files = frozenset(os.listdir(self.assets_folder))
+            except OSError:
+                self._assets_files = frozenset()
+        return self._assets_files
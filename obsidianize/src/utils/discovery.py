@@ -0,0 +1,308 @@
+"""
+This file contains the discovery of the notebooks in a folder tree.
+The tree is walked with os.scandir, lazily, so that the notebooks can be converted while the walk goes on. The folders
+that never contain notebooks to convert (PRUNED_FOLDERS, hidden folders, virtual environments) are not entered, and
+the paths excluded by .gitignore-style patterns (the .gitignore files of the repository, and the exclude patterns given)
+are skipped. The .gitignore files are read from the root of the repository, so that a folder of the repository is
+searched the same way whether the walk starts at the root of the repository or in the folder itself.
+"""
+import os
+import re
+
+from obsidianize.src.utils.path_utils import find_ancestor_with
+
+# Folders never entered: they do not contain notebooks to convert, or contain generated or huge trees
+PRUNED_FOLDERS = {
+    ".git", ".ipynb_checkpoints", "assets", "node_modules", "__pycache__", ".venv", "venv", ".obsidian", ".tox",
+    ".mypy_cache", ".pytest_cache", "site-packages",
+}
+# A folder containing this file is a virtual environment, whatever its name
+VENV_MARKER = "pyvenv.cfg"
+IGNORE_FILE = ".gitignore"
+
+
+def is_pruned_folder(name: str) -> bool:
+    """
+    Function to check whether a folder is never searched for notebooks, whatever the ignore rules.
+    :param name: str: the name of the folder
+    :return: bool: True if the folder is pruned
+    """
+    return name in PRUNED_FOLDERS or name.startswith(".")
+
+
+def _translate(pattern: str) -> str:
+    """
+    Function to translate a .gitignore glob to a regular expression.
+    :param pattern: str: the glob, without its leading ! and trailing /
+    :return: str: the regular expression (matching a whole path, relative to the folder of the pattern)
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        character = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+            continue
+        if character == "*":
+            parts.append("[^/]*")
+        elif character == "?":
+            parts.append("[^/]")
+        elif character == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            content = pattern[i + 1:end]
+            if content.startswith("!"):
+                content = "^" + content[1:]
+            parts.append(f"[{content.replace(chr(92), chr(92) * 2)}]")
+            i = end
+        elif character == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 1
+        else:
+            parts.append(re.escape(character))
+        i += 1
+    return "".join(parts)
+
+
+class IgnoreRules:
+    """
+    Ordered .gitignore-style rules, the last rule matching a path decides whether it is ignored.
+    The rules are immutable: extended returns new rules, so that each folder of the walk shares the rules of its parent.
+    """
+
+    def __init__(self, rules: tuple = ()):
+        self.rules = rules
+
+    def extended(self, patterns, base: str = ""):
+        """
+        Function to add rules.
+        :param patterns: iterable of str: the .gitignore lines
+        :param base: str: the folder the patterns are relative to, relative to the root of the walk ("" for the root)
+        :return: IgnoreRules: the rules, with the new ones last
+        """
+        rules = list(self.rules)
+        for pattern in patterns:
+            pattern = pattern.rstrip("\n").rstrip()
+            if not pattern or pattern.startswith("#"):
+                continue
+            negate = pattern.startswith("!")
+            if negate:
+                pattern = pattern[1:]
+            directory_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            if not pattern:
+                continue
+            # A pattern with a slash (other than a trailing one) is relative to its folder, else it matches the names
+            anchored = "/" in pattern
+            regex = re.compile(_translate(pattern.lstrip("/")) + r"\Z")
+            rules.append((base, regex, negate, directory_only, anchored))
+        return IgnoreRules(tuple(rules))
+
+    def is_ignored(self, relative_path: str, is_dir: bool) -> bool:
+        """
+        Function to check whether a path is ignored.
+        :param relative_path: str: the path, relative to the root of the walk, with / separators
+        :param is_dir: bool: whether the path is a folder
+        :return: bool: True if the path is ignored
+        """
+        name = relative_path.rpartition("/")[2]
+        for base, regex, negate, directory_only, anchored in reversed(self.rules):
+            if directory_only and not is_dir:
+                continue
+            if base:
+                if not relative_path.startswith(base + "/"):
+                    continue
+                path = relative_path[len(base) + 1:]
+            else:
+                path = relative_path
+            if regex.match(path if anchored else name):
+                return not negate
+        return False
+
+
+def _read_ignore_file(path: str) -> list:
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.readlines()
+    except OSError:
+        return []
+
+
+class NotebookDiscovery:
+    """
+    Lazy, pruned walk of a folder tree, listing the notebooks to convert.
+    """
+
+    def __init__(
+            self,
+            root: str,
+            include: str = "*.ipynb",
+            exclude=(),
+            gitignore: bool = True,
+            recursive: bool = True,
+    ):
+        """
+        :param root: str: the folder to search
+        :param include: str: the glob the notebooks match (on their name, or on their path relative to root if it
+        contains a /)
+        :param exclude: str or iterable of str: .gitignore-style patterns of the paths to skip, relative to root (a
+        string can hold several comma-separated patterns)
+        :param gitignore: bool: also skip the paths ignored by the .gitignore files of the repository containing root
+        (from the root of the repository down)
+        :param recursive: bool: search the subfolders of root
+        """
+        if isinstance(exclude, str):
+            exclude = exclude.split(",")
+        self.root = root
+        self.include = re.compile(_translate(include.lstrip("/")) + r"\Z")
+        self.include_path = "/" in include
+        self.gitignore = gitignore
+        self.recursive = recursive
+        # The rules match the paths relative to the root of the repository, prefix is the path of root from there
+        self.prefix = ""
+        repo_path = find_ancestor_with(os.path.abspath(root), ".git") if gitignore else None
+        if repo_path is not None:
+            self.prefix = os.path.relpath(os.path.abspath(root), repo_path).replace(os.sep, "/")
+            self.prefix = "" if self.prefix == "." else self.prefix
+        self.rules = IgnoreRules().extended(exclude, self.prefix)
+        # Whether root itself is ignored by the .gitignore files of the folders above it
+        self.root_ignored = False
+        if self.prefix:
+            parts = self.prefix.split("/")
+            for depth in range(len(parts)):
+                folder = os.path.join(repo_path, *parts[:depth])
+                self.rules = self.rules.extended(_read_ignore_file(os.path.join(folder, IGNORE_FILE)),
+                                                 "/".join(parts[:depth]))
+                if self.rules.is_ignored("/".join(parts[:depth + 1]), True):
+                    self.root_ignored = True
+                    break
+
+    def _relative(self, path: str) -> str:
+        relative_path = os.path.relpath(path, self.root)
+        return "" if relative_path == "." else relative_path.replace(os.sep, "/")
+
+    def _rule_path(self, relative_path: str) -> str:
+        """
+        Function to get the path the rules match, from a path relative to root.
+        :param relative_path: str: the path, relative to root, with / separators ("" for root)
+        :return: str: the path, relative to the root of the repository
+        """
+        if not self.prefix:
+            return relative_path
+        return f"{self.prefix}/{relative_path}" if relative_path else self.prefix
+
+    def _get_rules(self, folder: str):
+        """
+        Function to get the rules applying to the content of a folder of the tree, when the walk does not start at root.
+        :param folder: str: the folder, under root
+        :return: IgnoreRules: the rules of the .gitignore files from the root of the repository to folder, and the
+        excludes (None if folder, or one of the folders above it, is pruned or ignored)
+        """
+        if self.root_ignored:
+            return None
+        relative_folder = self._relative(folder)
+        parts = relative_folder.split("/") if relative_folder else []
+        rules = self.rules
+        for depth in range(len(parts) + 1):
+            base = self._rule_path("/".join(parts[:depth]))
+            if depth and (is_pruned_folder(parts[depth - 1]) or rules.is_ignored(base, True)):
+                return None
+            if self.gitignore:
+                rules = rules.extended(_read_ignore_file(os.path.join(self.root, *parts[:depth], IGNORE_FILE)), base)
+        return rules
+
+    def _is_included(self, relative_path: str, name: str) -> bool:
+        return self.include.match(relative_path if self.include_path else name) is not None
+
+    def walk(self, start: str = None):
+        """
+        Function to walk the tree.
+        :param start: str: the folder to start from, under root (root by default)
+        :return: generator of (folder, notebooks) tuples, with notebooks the list of the paths to the notebooks of the
+        folder, in name order
+        """
+        start = self.root if start is None else start
+        relative_start = self._relative(start)
+        if relative_start:
+            # The walk starts below root, it goes on with the rules of the folders above start
+            rules = self._get_rules(os.path.dirname(start))
+            if rules is None or is_pruned_folder(os.path.basename(start)):
+                return
+            if rules.is_ignored(self._rule_path(relative_start), True):
+                return
+            stack = [(start, relative_start, rules)]
+        elif self.root_ignored:
+            return
+        else:
+            stack = [(start, "", self.rules)]
+
+        while stack:
+            folder, relative_folder, rules = stack.pop()
+            try:
+                with os.scandir(folder) as iterator:
+                    entries = sorted(iterator, key=lambda entry: entry.name)
+            except OSError:
+                continue
+            names = {entry.name for entry in entries}
+            if relative_folder and VENV_MARKER in names:
+                continue
+            if self.gitignore and IGNORE_FILE in names:
+                rules = rules.extended(_read_ignore_file(os.path.join(folder, IGNORE_FILE)),
+                                       self._rule_path(relative_folder))
+
+            notebooks = []
+            subfolders = []
+            prefix = relative_folder + "/" if relative_folder else ""
+            for entry in entries:
+                relative_path = prefix + entry.name
+                rule_path = self._rule_path(relative_path)
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir:
+                    if not self.recursive or is_pruned_folder(entry.name) or rules.is_ignored(rule_path, True):
+                        continue
+                    subfolders.append((entry.path, relative_path, rules))
+                elif self._is_included(relative_path, entry.name) and not rules.is_ignored(rule_path, False):
+                    if entry.is_file():
+                        notebooks.append(entry.path)
+            yield folder, notebooks
+            # Depth first, in name order
+            stack.extend(reversed(subfolders))
+
+    def iter_notebooks(self, start: str = None):
+        """
+        Function to list the notebooks of the tree, lazily.
+        :param start: str: the folder to start from, under root (root by default)
+        :return: generator of str: the paths to the notebooks
+        """
+        for _, notebooks in self.walk(start):
+            yield from notebooks
+
+    def iter_folders(self, start: str = None):
+        """
+        Function to list the folders of the tree that are searched for notebooks, lazily.
+        :param start: str: the folder to start from, under root (root by default)
+        :return: generator of str: the paths to the folders
+        """
+        for folder, _ in self.walk(start):
+            yield folder
+
+    def accepts(self, path: str) -> bool:
+        """
+        Function to check whether a notebook of the tree would be listed by the walk (e.g. a notebook just written).
+        :param path: str: the path to the notebook
+        :return: bool: True if the notebook is included and not excluded
+        """
+        relative_path = self._relative(path)
+        if relative_path.startswith("../") or not self._is_included(relative_path, os.path.basename(path)):
+            return False
+        if not self.recursive and "/" in relative_path:
+            return False
+        rules = self._get_rules(os.path.dirname(path))
+        return rules is not None and not rules.is_ignored(self._rule_path(relative_path), False)
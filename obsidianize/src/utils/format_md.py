@@ -1,66 +1,125 @@
 import re
 
-from ..view.view_utils import pick_view, view, get_supported_display_types
+from .calls import find_obsidian_calls
+from .context import ConversionContext
+from ..view.view_utils import view, get_supported_display_types
 
+# ![title](link), as written by the view handlers
+_EMBED_RE = re.compile(r"!\[([^\]\n]*)\]\(([^)\n]+)\)")
 
-def format_markdown(markdown: str,
-                    notebook_path: str,
-                    ) -> str:
+
+class MarkdownFormatter:
     """
-    Function to format the markdown string.
-    :param markdown: str: the markdown string to format
-    :param notebook_path: str: the name of the notebook
-    :return: str: the formatted markdown string
+    Line by line formatter turning the markdown of a notebook into Obsidian markdown: python code blocks become
+    run-python blocks, everything outside of the code blocks is dropped, and the displays found in a code block are
+    embedded in a Results section after it.
+    The lines can be fed from the markdown rendered by nbconvert, or directly from the cells of the notebook.
     """
 
-    # Replace '```python' with '```run-python'
-    markdown = re.sub(r'```python', '```run-python', markdown)
-
-    # Remove lines starting with ![png]
-    markdown = re.sub(r'^!\[png\].*$', '', markdown, flags=re.MULTILINE)
+    def __init__(self, notebook_path: str, context: ConversionContext = None):
+        self.notebook_path = notebook_path
+        # The paths of the notebook are resolved once, when the first display is found
+        self.context = context if context is not None else ConversionContext(notebook_path)
+        self.processed_lines = []
+        self.display_queue = []
+        # Get the list of supported display types
+        supported_display_types = get_supported_display_types()
+        self.supported_display_types = set(supported_display_types)
+        self.display_counter = {display_type: 0 for display_type in supported_display_types}
+        self.in_code_block = False
+        # Lines of the current code block, parsed when the block is closed
+        self.block_lines = []
+        # (display type, title, link) of each asset embedded
+        self.embeds = []
 
-    # Process the markdown
-    lines = markdown.split('\n')
-    processed_lines = []
-    display_queue = []
-    # Get the list of supported display types
-    supported_display_types = get_supported_display_types()
-    display_counter = {display_type: 0 for display_type in supported_display_types}
+    def feed(self, line: str):
+        """
+        Function to process one line of markdown.
+        :param line: str: the line to process (without its newline character)
+        :return: nothing
+        """
+        # Replace '```python' with '```run-python'
+        line = line.replace('```python', '```run-python')
 
-    in_code_block = False
-    for i, line in enumerate(lines):
+        # Remove lines starting with ![png]
+        if line.startswith('![png]'):
+            line = ''
 
         # Identify if we are in a code block
         if line.startswith('```run-python'):
-            in_code_block = True
-            processed_lines.append(line)
+            self.in_code_block = True
+            self.processed_lines.append(line)
 
         elif line.startswith('```'):
-            in_code_block = False
+            if self.in_code_block:
+                # Find the displays of the code block
+                self.queue_displays('\n'.join(self.block_lines))
+            self.in_code_block = False
+            self.block_lines = []
             # Add the line to the processed lines
-            processed_lines.append(line)
+            self.processed_lines.append(line)
             # Add the display queue to the processed lines
-            if display_queue:
-                processed_lines.append('\n#### Results')
-            processed_lines.extend(display_queue)
+            if self.display_queue:
+                self.processed_lines.append('\n#### Results')
+            self.processed_lines.extend(self.display_queue)
             # Add a newline for readability
-            processed_lines.append('')
+            self.processed_lines.append('')
             # Clear the display queue
-            display_queue = []
+            self.display_queue = []
+
+        # Check if we are in a code block
+        elif self.in_code_block:
+            self.processed_lines.append(line)
+            self.block_lines.append(line)
+        # else:
+            # Don't Add the line to the processed lines
+
+    def queue_displays(self, source: str):
+        """
+        Function to add the displays of a code block to the display queue.
+        :param source: str: the source of the code block
+        :return: nothing
+        """
+        for call in find_obsidian_calls(source):
+            if call.display_type in self.supported_display_types:
+                start = len(self.display_queue)
+                view(call.display_type, call.title, self.display_queue, self.display_counter, self.context)
+                for line in self.display_queue[start:]:
+                    self.embeds.extend((call.display_type, title, link) for title, link in _EMBED_RE.findall(line))
 
-        else:
-            # Check if we are in a code block
-            if in_code_block:
-                # Check if the line contains a display
-                which_view = pick_view(line)
-                processed_lines.append(line)
-                if which_view is not None:
-                    view(which_view, line, display_queue, display_counter, notebook_path)
-            # else:
-                # Don't Add the line to the processed lines
-                # processed_lines.append(line)
+    def feed_lines(self, lines):
+        """
+        Function to process several lines of markdown.
+        :param lines: iterable of str: the lines to process
+        :return: nothing
+        """
+        for line in lines:
+            self.feed(line)
 
-    # Join the processed lines
-    processed_markdown = '\n'.join(processed_lines)
+    def getvalue(self) -> str:
+        """
+        Function to get the formatted markdown.
+        :return: str: the formatted markdown string
+        """
+        # Join the processed lines
+        return '\n'.join(self.processed_lines)
 
-    return processed_markdown
+
+def format_markdown(markdown: str,
+                    notebook_path: str,
+                    context: ConversionContext = None,
+                    embeds: list = None,
+                    ) -> str:
+    """
+    Function to format the markdown string.
+    :param markdown: str: the markdown string to format
+    :param notebook_path: str: the name of the notebook
+    :param context: ConversionContext: the paths of the notebook, if they are already resolved
+    :param embeds: list: list extended with the (display type, title, link) of each asset embedded (None to skip)
+    :return: str: the formatted markdown string
+    """
+    formatter = MarkdownFormatter(notebook_path, context)
+    formatter.feed_lines(markdown.split('\n'))
+    if embeds is not None:
+        embeds.extend(formatter.embeds)
+    return formatter.getvalue()
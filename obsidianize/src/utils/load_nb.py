@@ -0,0 +1,332 @@
+"""
+This file contains the loaders of the notebooks.
+The "nbformat" loader reads the whole notebook with nbformat.read, which validates it against the nbformat schema. The
+"fast" loader parses the file with orjson (when it is installed) through a memory map and builds the notebook without
+validating it, after checking the structure the conversion relies on. The "stream" loader parses the file chunk by chunk
+and drops, while parsing, the output payloads that can never end up in the markdown file: images and other binary
+outputs, plain text outputs, streams and tracebacks are all rendered outside of the code blocks, which the formatter
+throws away. Only the outputs rendered as raw text (html, markdown, latex) are kept, as they may contain code blocks.
+The memory used by the stream loader does not grow with the size of the outputs. The "auto" loader streams the
+notebooks larger than STREAM_THRESHOLD and loads the others with the fast loader.
+The fast and stream loaders fall back to nbformat.read for the notebooks older than version 4, and for the files they
+cannot handle, so that nbformat converts them or reports their errors.
+"""
+import json
+import mmap
+import os
+import re
+
+from obsidianize.src.utils.native_md import RAW_MIMETYPES
+
+LOADERS = ("nbformat", "fast", "stream", "auto")
+CELL_TYPES = ("code", "markdown", "raw")
+STREAM_THRESHOLD = 32 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+_SCALAR_RE = re.compile(r"[^,\]}\s]+")
+
+# What the values of an object hold, by context and key (None: kept as is, "skip": dropped)
+_OBJECT_CONTEXTS = {
+    "notebook": {"cells": "cells"},
+    "cell": {"outputs": "outputs"},
+    "output": {"data": "data", "text": "skip", "traceback": "skip"},
+}
+_ARRAY_CONTEXTS = {"cells": "cell", "outputs": "output"}
+
+
+class _StreamParser:
+    """
+    Incremental JSON parser reading a file chunk by chunk, skipping the values the conversion does not need.
+    The skipped values are replaced with an empty value of the same type, so that the structure of the notebook is
+    kept (e.g. the mimetypes of an output, which decide how nbconvert renders it).
+    """
+
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+
+    def _fill(self) -> bool:
+        data = self.f.read(self.chunk_size)
+        if not data:
+            return False
+        self.buffer = self.buffer[self.position:] + data
+        self.position = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self.position = _WHITESPACE_RE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                raise ValueError("unexpected end of the notebook file")
+
+    def _expect(self, character: str):
+        if self._peek() != character:
+            raise ValueError(f"expected {character!r} at character {self.position} of the chunk")
+        self.position += 1
+
+    def parse(self):
+        return self._value(context="notebook")
+
+    def _value(self, context=None):
+        character = self._peek()
+        if character == "{":
+            return self._object(context)
+        if character == "[":
+            return self._array(context)
+        if character == '"':
+            return self._string(keep=context != "skip")
+        return self._scalar()
+
+    def _object(self, context):
+        self._expect("{")
+        result = {}
+        if self._peek() == "}":
+            self.position += 1
+            return result
+        while True:
+            key = self._string(keep=True)
+            self._expect(":")
+            if context == "skip":
+                child = "skip"
+            elif context == "data":
+                child = None if key in RAW_MIMETYPES else "skip"
+            else:
+                child = _OBJECT_CONTEXTS.get(context, {}).get(key)
+            value = self._value(child)
+            if context != "skip":
+                result[key] = value
+            separator = self._peek()
+            self.position += 1
+            if separator == "}":
+                return result
+            if separator != ",":
+                raise ValueError(f"unexpected {separator!r} in an object")
+
+    def _array(self, context):
+        self._expect("[")
+        result = []
+        if self._peek() == "]":
+            self.position += 1
+            return result
+        child = "skip" if context == "skip" else _ARRAY_CONTEXTS.get(context)
+        while True:
+            value = self._value(child)
+            if context != "skip":
+                result.append(value)
+            separator = self._peek()
+            self.position += 1
+            if separator == "]":
+                return result
+            if separator != ",":
+                raise ValueError(f"unexpected {separator!r} in an array")
+
+    def _string(self, keep: bool):
+        self._expect('"')
+        pieces = []
+        start = self.position
+        while True:
+            buffer = self.buffer
+            end = buffer.find('"', start)
+            if end != -1:
+                # The quote is escaped if it follows an odd number of backslashes
+                backslash = end
+                while backslash > self.position and buffer[backslash - 1] == "\\":
+                    backslash -= 1
+                if (end - backslash) % 2:
+                    start = end + 1
+                    continue
+                if keep:
+                    pieces.append(buffer[self.position:end])
+                self.position = end + 1
+                break
+            # The string goes on in the next chunk, keep the backslashes ending this one as they may escape a quote
+            end = len(buffer)
+            while end > self.position and buffer[end - 1] == "\\":
+                end -= 1
+            if keep:
+                pieces.append(buffer[self.position:end])
+            self.position = end
+            if not self._fill():
+                raise ValueError("unexpected end of the notebook file")
+            start = len(buffer) - end
+        if not keep:
+            return ""
+        raw = "".join(pieces)
+        if "\\" not in raw:
+            return raw
+        return json.loads(f'"{raw}"')
+
+    def _scalar(self):
+        while True:
+            match = _SCALAR_RE.match(self.buffer, self.position)
+            if match is None:
+                raise ValueError(f"unexpected {self.buffer[self.position]!r} in the notebook file")
+            # The token may go on in the next chunk
+            if match.end() == len(self.buffer) and self._fill():
+                continue
+            self.position = match.end()
+            return json.loads(match.group())
+
+
+def stream_notebook_dict(path: str, chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Function to parse a notebook file without the output payloads the conversion does not need.
+    :param path: str: the path to the notebook
+    :param chunk_size: int: the number of characters read at once
+    :return: dict: the notebook, as the JSON dictionary of the file (with the skipped values emptied)
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return _StreamParser(f, chunk_size).parse()
+
+
+def read_notebook_dict(path: str) -> dict:
+    """
+    Function to parse a notebook file through a memory map, with orjson when it is installed (the json module
+    otherwise).
+    :param path: str: the path to the notebook
+    :return: dict: the notebook, as the JSON dictionary of the file
+    """
+    orjson = _get_orjson()
+    with open(path, "rb") as f:
+        if orjson is None or os.fstat(f.fileno()).st_size == 0:
+            return json.loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data, memoryview(data) as view:
+            return orjson.loads(view)
+
+
+def _get_orjson():
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def _check_structure(nb_dict) -> bool:
+    """
+    Function to check the structure the conversion relies on, instead of validating the whole notebook.
+    :param nb_dict: the parsed notebook file
+    :return: bool: True if the notebook is a version 4 notebook with well formed cells
+    """
+    if not isinstance(nb_dict, dict) or nb_dict.get("nbformat") != 4 or not isinstance(nb_dict.get("cells"), list):
+        return False
+    if not isinstance(nb_dict.get("metadata", {}), dict):
+        return False
+    for cell in nb_dict["cells"]:
+        if not isinstance(cell, dict) or cell.get("cell_type") not in CELL_TYPES:
+            return False
+        if not isinstance(cell.get("source"), (str, list)) or not isinstance(cell.get("metadata", {}), dict):
+            return False
+        if cell["cell_type"] == "code" and not isinstance(cell.get("outputs", []), list):
+            return False
+    return True
+
+
+def notebook_from_dict(nb_dict):
+    """
+    Function to build a version 4 NotebookNode from the JSON dictionary of a notebook file, as nbformat.read does but
+    without validating it.
+    :param nb_dict: the parsed notebook file
+    :return: NotebookNode: the notebook, or None if it is not a well formed version 4 notebook (nbformat.read converts
+    the older versions and reports the errors)
+    """
+    import nbformat
+
+    if not _check_structure(nb_dict):
+        return None
+    return nbformat.versions[4].to_notebook_json(nb_dict, minor=nb_dict.get("nbformat_minor", 0))
+
+
+def validate_notebook(notebook, path: str):
+    """
+    Function to validate a notebook against the nbformat schema. Like nbformat.read, an invalid notebook is only
+    reported, the conversion goes on.
+    :param notebook: NotebookNode: the notebook
+    :param path: str: the path to the notebook, for the error message
+    :return: bool: True if the notebook is valid
+    """
+    import nbformat
+
+    try:
+        nbformat.validate(notebook)
+    except nbformat.ValidationError as e:
+        print(f"{path} is not a valid notebook: {e.message}")
+        return False
+    return True
+
+
+def parse_notebook(source, validate: bool = False, name: str = "notebook"):
+    """
+    Function to load a notebook held in memory.
+    :param source: NotebookNode, dict, bytes, str or file object: the notebook, its JSON dictionary, its JSON text, or
+    a file object to read it from
+    :param validate: bool: validate the notebook against the nbformat schema (the notebooks older than version 4 are
+    always validated, by nbformat)
+    :param name: str: the name of the notebook in the error messages
+    :return: NotebookNode: the notebook (version 4)
+    """
+    import nbformat
+
+    if hasattr(source, "read"):
+        source = source.read()
+    if isinstance(source, (bytearray, memoryview)):
+        source = bytes(source)
+    if isinstance(source, (bytes, str)):
+        orjson = _get_orjson()
+        try:
+            nb_dict = json.loads(source) if orjson is None else orjson.loads(source)
+        except ValueError:
+            # Not JSON, let nbformat report it
+            nb_dict = None
+        notebook = notebook_from_dict(nb_dict)
+        if notebook is None:
+            return nbformat.reads(source if isinstance(source, str) else source.decode("utf-8"), as_version=4)
+    elif isinstance(source, dict):
+        notebook = source if isinstance(source, nbformat.NotebookNode) else notebook_from_dict(source)
+        if notebook is None or notebook.get("nbformat") != 4:
+            notebook = nbformat.convert(nbformat.from_dict(source), 4)
+            validate = True
+    else:
+        raise ValueError("the notebook should be a NotebookNode, a dict, bytes, a str or a file object")
+
+    if validate:
+        validate_notebook(notebook, name)
+    return notebook
+
+
+def load_notebook(path: str, loader: str = "nbformat", validate: bool = False) -> tuple:
+    """
+    Function to load a notebook.
+    :param path: str: the path to the notebook
+    :param loader: str: "nbformat" (nbformat.read, validates the notebook), "fast" (parse the file with orjson and
+    build the notebook without validating it), "stream" (skip the output payloads the conversion does not need) or
+    "auto" (stream the notebooks larger than STREAM_THRESHOLD, fast for the others)
+    :param validate: bool: validate the notebook with the fast and stream loaders too
+    :return: tuple: (notebook, complete) with complete False if output payloads have been skipped
+    """
+    import nbformat
+
+    if loader not in LOADERS:
+        raise ValueError(f"loader should be one of {', '.join(LOADERS)}")
+    if loader == "auto":
+        loader = "stream" if os.path.getsize(path) > STREAM_THRESHOLD else "fast"
+
+    if loader != "nbformat":
+        try:
+            nb_dict = stream_notebook_dict(path) if loader == "stream" else read_notebook_dict(path)
+        except ValueError:
+            # Not JSON, let nbformat report it
+            nb_dict = None
+        notebook = notebook_from_dict(nb_dict)
+        if notebook is not None:
+            if validate:
+                validate_notebook(notebook, path)
+            return notebook, loader != "stream"
+
+    with open(path, "r", encoding="utf-8") as f:
+        return nbformat.read(f, as_version=4), True
@@ -0,0 +1,246 @@
+"""
+This file contains the conversion manifest, used to skip the notebooks whose markdown file is already up to date.
+The manifest is stored per repository (in .git/obsidianize/manifest.json, so it is never committed) and records, for
+each notebook, the content hash of the .ipynb file and a fingerprint of the converter (version, source and options).
+"""
+import functools
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = "manifest.json"
+
+
+def get_git_folder(repo_path: str):
+    """
+    Function to get the git folder of a repository, following the "gitdir:" pointer of the .git file of the worktrees
+    and submodules.
+    :param repo_path: str: the path to the repository
+    :return: str: the path to the git folder, or None if repo_path is not the root of a git repository
+    """
+    git_path = os.path.join(repo_path, ".git")
+    if os.path.isdir(git_path):
+        return git_path
+    try:
+        with open(git_path, "r") as f:
+            content = f.read().strip()
+    except OSError:
+        return None
+    if not content.startswith("gitdir:"):
+        return None
+    git_folder = os.path.normpath(os.path.join(repo_path, content[len("gitdir:"):].strip()))
+    return git_folder if os.path.isdir(git_folder) else None
+
+
+def get_cache_folder(repo_path: str) -> str:
+    """
+    Function to get the folder where obsidianize keeps its per-repository cache files.
+    :param repo_path: str: the path to the repository
+    :return: str: the path to the cache folder (obsidianize in the git folder, or .obsidianize outside of git)
+    """
+    git_folder = get_git_folder(repo_path)
+    if git_folder is not None:
+        return os.path.join(git_folder, "obsidianize")
+    cache_folder = os.path.join(repo_path, ".obsidianize")
+    _exclude_from_git(cache_folder)
+    return cache_folder
+
+
+def _exclude_from_git(folder: str):
+    # Add folder to the exclude file of the git repository it is in, if any, so that it is never committed
+    repo_path = os.path.dirname(os.path.abspath(folder))
+    while get_git_folder(repo_path) is None:
+        parent = os.path.dirname(repo_path)
+        if parent == repo_path:
+            return
+        repo_path = parent
+    exclude_path = os.path.join(get_git_folder(repo_path), "info", "exclude")
+    pattern = "/" + os.path.relpath(os.path.abspath(folder), repo_path).replace(os.sep, "/") + "/"
+    try:
+        with open(exclude_path, "r") as f:
+            content = f.read()
+    except OSError:
+        content = ""
+    if pattern in content.splitlines():
+        return
+    try:
+        os.makedirs(os.path.dirname(exclude_path), exist_ok=True)
+        with open(exclude_path, "a") as f:
+            f.write(("\n" if content and not content.endswith("\n") else "") + f"{pattern}\n")
+    except OSError:
+        pass
+
+
+def hash_file(path: str) -> str:
+    """
+    Function to compute the content hash of a file.
+    :param path: str: the path to the file
+    :return: str: the hexadecimal digest of the file content
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def get_source_hash() -> str:
+    """
+    Function to compute the hash of the source files of obsidianize, so that a change of the converter invalidates the
+    conversions and rendered cells recorded by a previous version (e.g. in an editable install).
+    :return: str: the hexadecimal digest of the source files
+    """
+    package_folder = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    digest = hashlib.blake2b(digest_size=20)
+    for folder, subfolders, files in os.walk(package_folder):
+        subfolders[:] = sorted(name for name in subfolders if name != "__pycache__")
+        for name in sorted(files):
+            if not name.endswith(".py"):
+                continue
+            path = os.path.join(folder, name)
+            digest.update(os.path.relpath(path, package_folder).encode("utf-8"))
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def get_converter_fingerprint(options: dict = None) -> str:
+    """
+    Function to compute the fingerprint of the converter (obsidianize version and source, and conversion options).
+    :param options: dict: the conversion options that have an influence on the markdown output
+    :return: str: the fingerprint
+    """
+    from obsidianize import __version__
+
+    payload = json.dumps({"version": __version__, "source": get_source_hash(), "options": options or {}},
+                         sort_keys=True)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+
+class ConversionManifest:
+    """
+    Persistent record of the notebooks converted in a repository.
+    A notebook is up to date if its content hash and the converter fingerprint match the recorded ones, and its markdown
+    file still exists. The size and modification time of the notebook are kept as well, so that unchanged notebooks are
+    recognised without reading them.
+    """
+
+    def __init__(self, repo_path: str, options: dict = None):
+        self.repo_path = repo_path
+        self.path = os.path.join(get_cache_folder(repo_path), MANIFEST_NAME)
+        self.fingerprint = get_converter_fingerprint(options)
+        self.entries = {}
+        self.changed = False
+        # States (size, modification time, hash) computed while checking notebooks, reused by snapshot
+        self._states = {}
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _key(self, notebook_path: str) -> str:
+        return os.path.relpath(notebook_path, self.repo_path)
+
+    def is_known(self, notebook_path: str) -> bool:
+        """
+        Function to check whether a notebook has already been converted (whatever its current content).
+        :param notebook_path: str: the absolute path to the notebook
+        :return: bool: True if the manifest has an entry for the notebook
+        """
+        return self._key(notebook_path) in self.entries
+
+    def is_up_to_date(self, notebook_path: str) -> bool:
+        """
+        Function to check whether the markdown file of a notebook is up to date.
+        :param notebook_path: str: the absolute path to the notebook
+        :return: bool: True if the notebook does not need to be converted again
+        """
+        entry = self.entries.get(self._key(notebook_path))
+        if entry is None or entry["fingerprint"] != self.fingerprint:
+            return False
+        if not os.path.exists(notebook_path.replace(".ipynb", ".md")):
+            return False
+
+        stat = os.stat(notebook_path)
+        if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+        if stat.st_size != entry["size"]:
+            return False
+
+        # The notebook has been touched, compare its content
+        content_hash = hash_file(notebook_path)
+        self._states[notebook_path] = (stat.st_size, stat.st_mtime_ns, content_hash)
+        if content_hash != entry["hash"]:
+            return False
+        entry["mtime_ns"] = stat.st_mtime_ns
+        self.changed = True
+        return True
+
+    def snapshot(self, notebook_path: str) -> tuple:
+        """
+        Function to get the state of a notebook before it is converted, to record it once the conversion succeeded.
+        If the notebook is saved during the conversion, the state recorded is the older one, so that the notebook is
+        converted again by the next run.
+        :param notebook_path: str: the absolute path to the notebook
+        :return: tuple: (size, mtime_ns, hash) of the notebook
+        """
+        state = self._states.pop(notebook_path, None)
+        if state is None:
+            # The file is stated before it is hashed, a save in between makes the recorded state older, not newer
+            stat = os.stat(notebook_path)
+            state = (stat.st_size, stat.st_mtime_ns, hash_file(notebook_path))
+        return state
+
+    def record(self, notebook_path: str, state: tuple = None):
+        """
+        Function to record a notebook as converted.
+        :param notebook_path: str: the absolute path to the notebook
+        :param state: tuple: the state of the notebook the markdown file was made from, as returned by snapshot (the
+        current state of the notebook by default)
+        :return: nothing
+        """
+        size, mtime_ns, content_hash = state if state is not None else self.snapshot(notebook_path)
+        self.entries[self._key(notebook_path)] = {
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "hash": content_hash,
+            "fingerprint": self.fingerprint,
+        }
+        self.changed = True
+
+    def forget(self, notebook_path: str):
+        """
+        Function to remove a notebook from the manifest.
+        :param notebook_path: str: the absolute path to the notebook
+        :return: nothing
+        """
+        if self.entries.pop(self._key(notebook_path), None) is not None:
+            self.changed = True
+
+    def rename(self, old_path: str, new_path: str):
+        """
+        Function to move the entry of a renamed notebook, so that it is still recognised as up to date.
+        :param old_path: str: the previous absolute path to the notebook
+        :param new_path: str: the new absolute path to the notebook
+        :return: nothing
+        """
+        entry = self.entries.pop(self._key(old_path), None)
+        if entry is not None:
+            self.entries[self._key(new_path)] = entry
+            self.changed = True
+
+    def save(self):
+        """
+        Function to write the manifest to disk, if it changed.
+        :return: nothing
+        """
+        if not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        self.changed = False
@@ -0,0 +1,214 @@
+"""
+This file contains the native renderer, an alternative to nbconvert that walks the cells of the notebook directly.
+The formatter only keeps the code blocks of the markdown rendered by nbconvert, so most of nbconvert's work (outputs,
+images, templates) is thrown away. The native renderer feeds the formatter only the lines it can act on: the code
+cells, the markdown and raw cells (which may contain code blocks), and the outputs rendered as raw text. The indented
+outputs (streams, plain text, tracebacks) and the images can never start a code block, so they are skipped.
+The result is the same as nbconvert followed by format_markdown, notebooks that the renderer cannot handle exactly
+(attachments, unbalanced code blocks) raise NativeRendererFallback so that the caller can use nbconvert instead.
+The cells are rendered one by one, so that the fragment of each cell can be kept in a render cache: only the cells
+that changed since the previous conversion are rendered again, the markdown is the concatenation of the fragments.
+"""
+import hashlib
+import json
+import re
+
+from obsidianize.src.placeholder_fun.large_frames import SIDE_FILE_EXTENSIONS
+from obsidianize.src.utils.format_md import MarkdownFormatter
+from obsidianize.src.utils.manifest import get_converter_fingerprint
+
+# Same magic languages and display priority as nbconvert's HighlightMagicsPreprocessor and MarkdownExporter
+MAGIC_LANGUAGES = {
+    "%%R": "r",
+    "%%bash": "bash",
+    "%%cython": "cython",
+    "%%javascript": "javascript",
+    "%%julia": "julia",
+    "%%latex": "latex",
+    "%%octave": "octave",
+    "%%perl": "perl",
+    "%%ruby": "ruby",
+    "%%sh": "sh",
+    "%%sql": "sql",
+}
+_MAGIC_LANGUAGE_RE = re.compile(rf"^\s*({'|'.join(MAGIC_LANGUAGES)})\s+")
+DISPLAY_PRIORITY = ['text/html', 'text/markdown', 'image/svg+xml', 'text/latex', 'image/png', 'image/jpeg', 'text/plain']
+# Mimetypes that nbconvert renders as is (the others are images or indented text)
+RAW_MIMETYPES = {'text/html', 'text/markdown', 'text/latex'}
+RAW_CELL_MIMETYPES = {'text/markdown', 'text/html', ''}
+
+
+class NativeRendererFallback(Exception):
+    """
+    Raised when a notebook cannot be rendered exactly like nbconvert would, nbconvert should be used instead.
+    """
+
+
+def _get_language(cell, notebook) -> str:
+    """
+    Function to get the language written after the opening ``` of a code cell, as nbconvert does.
+    :param cell: NotebookNode: the code cell
+    :param notebook: NotebookNode: the notebook
+    :return: str: the language of the code block
+    """
+    if 'magics_language' in cell.metadata:
+        return cell.metadata['magics_language']
+    match = _MAGIC_LANGUAGE_RE.match(cell.source)
+    if match:
+        return MAGIC_LANGUAGES[match.group(1)]
+    return notebook.metadata.get('language_info', {}).get('name', '')
+
+
+def _get_output_text(output):
+    """
+    Function to get the text of an output that nbconvert renders as is.
+    :param output: NotebookNode: the output
+    :return: str: the raw text of the output, or None if it is rendered as an image or indented text
+    """
+    if output.get('output_type') not in ('execute_result', 'display_data'):
+        return None
+    data = output.get('data', {})
+    for mimetype in DISPLAY_PRIORITY:
+        if mimetype in data:
+            if mimetype in RAW_MIMETYPES:
+                return data[mimetype]
+            return None
+    return None
+
+
+def iter_cell_markdown_lines(notebook, allow_attachments: bool = False):
+    """
+    Function to get the markdown lines of each cell of a notebook that can have an effect on the formatted markdown.
+    :param notebook: NotebookNode: the notebook to render (version 4)
+    :param allow_attachments: bool: yield the markdown cells with attachments instead of raising NativeRendererFallback
+    :return: generator of lists of lists of lines, one list per cell, holding one list of lines per cell input, markdown
+    cell, raw cell or raw output
+    """
+    for cell in notebook.cells:
+        remove_source = cell.metadata.get('transient', {}).get('remove_source', False)
+        groups = []
+        if cell.cell_type == 'code':
+            if not remove_source:
+                groups.append(['```' + _get_language(cell, notebook)] + cell.source.split('\n') + ['```'])
+            for output in cell.get('outputs', []):
+                text = _get_output_text(output)
+                if text is not None:
+                    groups.append(text.split('\n'))
+        elif cell.cell_type == 'markdown':
+            if cell.get('attachments') and not allow_attachments:
+                raise NativeRendererFallback("markdown cell with attachments")
+            if not remove_source:
+                groups.append(cell.source.split('\n'))
+        elif cell.cell_type == 'raw':
+            if not remove_source and cell.metadata.get('raw_mimetype', '').lower() in RAW_CELL_MIMETYPES:
+                groups.append(cell.source.split('\n'))
+        yield groups
+
+
+def iter_markdown_lines(notebook, allow_attachments: bool = False):
+    """
+    Function to get the markdown lines of a notebook that can have an effect on the formatted markdown.
+    :param notebook: NotebookNode: the notebook to render (version 4)
+    :param allow_attachments: bool: yield the markdown cells with attachments instead of raising NativeRendererFallback
+    :return: generator of lists of lines, one per cell input, markdown cell, raw cell or raw output
+    """
+    for groups in iter_cell_markdown_lines(notebook, allow_attachments):
+        yield from groups
+
+
+def code_blocks_closed(notebook) -> bool:
+    """
+    Function to check that no cell input, markdown cell, raw cell or raw output leaves a code block open, in which case
+    the outputs rendered between them (images, indented text) are dropped by the formatter whatever their content.
+    :param notebook: NotebookNode: the notebook (version 4)
+    :return: bool: True if every code block is closed where it is opened
+    """
+    in_code_block = False
+    for lines in iter_markdown_lines(notebook, allow_attachments=True):
+        for line in lines:
+            if line.startswith('```'):
+                # Same rule as MarkdownFormatter.feed
+                in_code_block = line.startswith(('```python', '```run-python'))
+        if in_code_block:
+            return False
+    return True
+
+
+def _get_cell_key(groups: list, formatter: MarkdownFormatter, fingerprint: str):
+    """
+    Function to compute the render cache key of a cell.
+    The key hashes the lines of the cell, and, when the cell may embed displays, the state its embeds depend on: the
+    display counters (which number the untitled displays), the assets folder and the side files of the large DataFrames.
+    :param groups: list: the lists of lines of the cell, see iter_cell_markdown_lines
+    :param formatter: MarkdownFormatter: the formatter, before the cell is fed
+    :param fingerprint: str: the fingerprint of the converter (version and source, see get_converter_fingerprint)
+    :return: bytes: the key, or None if the cell cannot be cached (its assets context cannot be resolved)
+    """
+    digest = hashlib.blake2b(fingerprint.encode('utf-8'), digest_size=20)
+    may_embed = False
+    for lines in groups:
+        text = '\n'.join(lines).encode('utf-8', 'surrogatepass')
+        digest.update(len(text).to_bytes(8, 'little'))
+        digest.update(text)
+        # The displays are only searched in the python code blocks
+        if b'obsidian_' in text and (b'```python' in text or b'```run-python' in text):
+            may_embed = True
+    if may_embed:
+        try:
+            context = formatter.context
+            side_files = sorted(name for name in context.assets_files
+                                if name.rpartition('.')[2] in SIDE_FILE_EXTENSIONS)
+            state = [sorted(formatter.display_counter.items()), str(context.assets_link_folder), side_files]
+        except Exception:
+            # Rendered without the cache, which raises the error again if the cell does embed a display
+            return None
+        digest.update(json.dumps(state).encode('utf-8'))
+    return digest.digest()
+
+
+def render_markdown(notebook, notebook_path: str, context=None, embeds: list = None, cache=None) -> str:
+    """
+    Function to render a notebook directly to Obsidian markdown, without nbconvert.
+    :param notebook: NotebookNode: the notebook to render (version 4)
+    :param notebook_path: str: the path of the notebook
+    :param context: ConversionContext: the paths of the notebook, if they are already resolved
+    :param embeds: list: list extended with the (display type, title, link) of each asset embedded (None to skip)
+    :param cache: RenderCache: the cache of the rendered cells, only the cells missing from it are rendered (None to
+    render every cell)
+    :return: str: the formatted markdown string (same as format_markdown(convert_to_markdown(notebook)))
+    """
+    formatter = MarkdownFormatter(notebook_path, context)
+    # The fingerprint hashes the source of obsidianize, so that the cells rendered by another version of the renderer
+    # are rendered again
+    fingerprint = None if cache is None else get_converter_fingerprint()
+    try:
+        for groups in iter_cell_markdown_lines(notebook):
+            key = None if cache is None else _get_cell_key(groups, formatter, fingerprint)
+            fragment = None if key is None else cache.get(key)
+            if fragment is not None:
+                lines, counters, cell_embeds = fragment
+                formatter.processed_lines.extend(lines)
+                for display_type, count in counters.items():
+                    formatter.display_counter[display_type] += count
+                formatter.embeds.extend(cell_embeds)
+                continue
+
+            start = len(formatter.processed_lines)
+            embeds_start = len(formatter.embeds)
+            counters_before = dict(formatter.display_counter)
+            for lines in groups:
+                formatter.feed_lines(lines)
+                # nbconvert separates the cells and outputs with template lines that would end up in an open code block
+                if formatter.in_code_block:
+                    raise NativeRendererFallback("code block left open")
+            if key is not None:
+                counters = {display_type: count - counters_before[display_type]
+                            for display_type, count in formatter.display_counter.items()
+                            if count != counters_before[display_type]}
+                cache.put(key, formatter.processed_lines[start:], counters, formatter.embeds[embeds_start:])
+    finally:
+        if cache is not None:
+            cache.flush()
+    if embeds is not None:
+        embeds.extend(formatter.embeds)
+    return formatter.getvalue()
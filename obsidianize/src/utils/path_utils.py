@@ -1,15 +1,79 @@
 import os
 from time import sleep
 
-import IPython
 from pathlib import Path
 
+# Values resolved once per kernel session, see reset_notebook_path
+_session = {}
+# Assets folders of the notebooks, by working directory and notebook path
+_assets_paths = {}
+# Folders found by find_ancestor_with, by folder and marker
+_ancestors = {}
+
+
+def find_ancestor_with(folder: str, marker: str):
+    """
+    Function to find the closest folder containing marker (e.g. ".git" or ".obsidian"), starting from folder and
+    climbing up the directory tree. The folder found is cached for every folder visited, so that the notebooks of a
+    batch share their lookups. Misses are not cached, so that a marker created later is found.
+    :param folder: str: the absolute path to the folder to start from
+    :param marker: str: the name of the file or folder to look for
+    :return: str: the path to the folder containing marker, or None if no ancestor contains it
+    """
+    visited = []
+    while True:
+        found = _ancestors.get((folder, marker))
+        if found is not None and os.path.exists(os.path.join(found, marker)):
+            break
+        if os.path.exists(os.path.join(folder, marker)):
+            found = folder
+            break
+        visited.append(folder)
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            return None
+        folder = parent
+    for visited_folder in visited:
+        _ancestors[(visited_folder, marker)] = found
+    return found
+
+
+def clear_path_caches():
+    """
+    Function to forget the cached repository and vault lookups (e.g. after a repository has been created or moved).
+    :return: nothing
+    """
+    _ancestors.clear()
+    _assets_paths.clear()
+
+
+def reset_notebook_path():
+    """
+    Function to forget the notebook path and environment detected for the kernel session (e.g. after the notebook has
+    been renamed or moved). They are detected again by the next call.
+    :return: nothing
+    """
+    _session.clear()
+    _assets_paths.clear()
+
 
 def get_notebook_path() -> str:
     """
     Function to get the path to the current notebook.
+    The path is detected once per kernel session, and detected again if the notebook no longer exists there.
     :return: str: the path to the current notebook
     """
+    notebook_path = _session.get("notebook_path")
+    if notebook_path is None or not os.path.exists(notebook_path):
+        notebook_path = _session["notebook_path"] = _find_notebook_path()
+    return notebook_path
+
+
+def _find_notebook_path() -> str:
+    # Walk up the frames until the variable set by the notebook frontend is found
+    # IPython is only needed from inside a notebook, import it here to keep it out of the CLI
+    import IPython
+
     try:
         depth = 0
         while True:
@@ -35,27 +99,31 @@ def get_assets_path(path_to_notebook: str) -> str:
     :param path_to_notebook: Absolute path to the notebook.
     :return: Absolute path to the assets subfolder relative to the notebook's location.
     """
+    # The result only depends on the working directory and the notebook path, reuse it while the folder exists
+    key = (os.getcwd(), path_to_notebook)
+    assets_path = _assets_paths.get(key)
+    if assets_path is None or not os.path.isdir(assets_path):
+        assets_path = _assets_paths[key] = _find_assets_path(path_to_notebook)
+    return assets_path
+
+
+def _find_assets_path(path_to_notebook: str) -> str:
     # Get the cwd
     cwd = Path.cwd()
     # Check if the cwd is a repository (check presence of .git with Path)
     if not Path(cwd / ".git").is_dir():
         cwd = Path(get_repo_path(str(cwd)))
     # Resolve the path to make it absolute
-    path_to_notebook = cwd / Path(path_to_notebook)
-    path_to_repo = path_to_notebook.parent
+    path_to_notebook = Path(os.path.abspath(cwd / Path(path_to_notebook)))
 
     # Navigate up to find the .git directory indicating the repo root.
-    while not (path_to_repo / ".git").exists():
-        if path_to_repo.parent == path_to_repo:
-            raise Exception(".git directory not found, are you sure this is a git repository?")
-        path_to_repo = path_to_repo.parent
+    path_to_repo = get_repo_path(str(path_to_notebook.parent))
 
     # Calculate the relative path from the repo to the notebook
-
     relpath_to_notebook = path_to_notebook.relative_to(path_to_repo)
 
     # The assets directory is in the root with a subdirectory structure mirroring that of the notebook
-    assets_path = path_to_repo / "assets" / relpath_to_notebook.parent
+    assets_path = Path(path_to_repo) / "assets" / relpath_to_notebook.parent
     assets_path.mkdir(parents=True, exist_ok=True)  # Create the directory if it doesn't exist
     return str(assets_path)
 
@@ -65,6 +133,15 @@ def in_obsidian_env() -> bool:
     Function to check if the current environment is an Obsidian environment.
     :return: bool: True if the current environment is an Obsidian environment, False otherwise
     """
+    # The environment does not change during a kernel session, only walk the frames once
+    if "obsidian_env" not in _session:
+        _session["obsidian_env"] = _find_obsidian_env()
+    return _session["obsidian_env"]
+
+
+def _find_obsidian_env() -> bool:
+    import IPython
+
     try:
         depth = 0
         while True:
@@ -84,12 +161,11 @@ def get_vault_root(notebook_path) -> str:
     :return: str: the root of the vault
     """
 
-    # Get the path to the notebook
-    path_to_notebook = Path(notebook_path)
     # Climb up the directory tree until we find the vault root (will contain .obsidian folder)
-    while not (path_to_notebook / ".obsidian").exists():
-        path_to_notebook = path_to_notebook.parent
-    return str(path_to_notebook)
+    vault_root = find_ancestor_with(os.path.abspath(notebook_path), ".obsidian")
+    if vault_root is None:
+        raise Exception(".obsidian directory not found, are you sure this is in an Obsidian vault?")
+    return vault_root
 
 
 def get_repo_path(notebook_path: str) -> str:
@@ -99,10 +175,8 @@ def get_repo_path(notebook_path: str) -> str:
     :return: str: the path to the repository
     """
 
-    # Get the path to the notebook
-    path_to_notebook = Path(notebook_path)
     # Climb up the directory tree until we find the .git folder (will contain .git folder)
-    while not (path_to_notebook / ".git").exists():
-        path_to_notebook = path_to_notebook.parent
-
-    return str(path_to_notebook)
+    repo_path = find_ancestor_with(os.path.abspath(notebook_path), ".git")
+    if repo_path is None:
+        raise Exception(".git directory not found, are you sure this is a git repository?")
+    return repo_path
@@ -0,0 +1,108 @@
+"""
+This file contains the profiler of the conversions (obsidianize convert --profile).
+Each stage of the conversion of a notebook (load, paths, export, format, save) records its wall time, its CPU time and
+the net number of memory blocks it left allocated (the blocks allocated minus the blocks freed, see
+sys.getallocatedblocks, not the number of allocations). When profiling is disabled, the stages are a shared nullcontext, so the
+instrumentation costs nothing.
+"""
+import contextlib
+import json
+import os
+import sys
+import time
+
+STAGES = ("load", "paths", "export", "format", "render", "save")
+
+_NO_STAGE = contextlib.nullcontext()
+
+
+class Profiler:
+    """
+    Timings of the stages of the conversion of one notebook.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        net_blocks = sys.getallocatedblocks()
+        try:
+            yield
+        finally:
+            timing = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0, "net_blocks": 0})
+            timing["wall"] += time.perf_counter() - wall
+            timing["cpu"] += time.process_time() - cpu
+            timing["net_blocks"] += sys.getallocatedblocks() - net_blocks
+
+
+def get_stage(profiler: Profiler, name: str):
+    """
+    Function to get the context manager measuring a stage.
+    :param profiler: Profiler: the profiler of the notebook, or None if profiling is disabled
+    :param name: str: the name of the stage
+    :return: the context manager
+    """
+    if profiler is None:
+        return _NO_STAGE
+    return profiler.stage(name)
+
+
+def summarize_profiles(profiles: dict) -> dict:
+    """
+    Function to add up the stage timings of several notebooks.
+    :param profiles: dict: the stage timings of each notebook, by path
+    :return: dict: the total timings of each stage
+    """
+    totals = {}
+    for stages in profiles.values():
+        for name, timing in stages.items():
+            total = totals.setdefault(name, {"wall": 0.0, "cpu": 0.0, "net_blocks": 0})
+            for key in total:
+                total[key] += timing[key]
+    return totals
+
+
+def print_profiles(profiles: dict):
+    """
+    Function to print the stage timings of the notebooks as a table (wall time in ms, CPU time in ms, and net
+    allocated blocks in thousands for each stage), slowest notebook first.
+    :param profiles: dict: the stage timings of each notebook, by path
+    :return: nothing
+    """
+    stages = [name for name in STAGES if any(name in timings for timings in profiles.values())]
+    header = "".join(f"{name:>24}" for name in stages)
+    print(f"{'notebook':<40}{header}")
+    print(f"{'':<40}" + "".join(f"{'wall':>8}{'cpu':>7}{'net kblk':>9}" for _ in stages))
+
+    def row(label: str, timings: dict):
+        cells = []
+        for name in stages:
+            timing = timings.get(name)
+            if timing is None:
+                cells.append(f"{'-':>24}")
+            else:
+                cells.append(f"{timing['wall'] * 1000:8.1f}{timing['cpu'] * 1000:7.1f}"
+                             f"{timing['net_blocks'] / 1000:9.1f}")
+        print(f"{label[-40:]:<40}" + "".join(cells))
+
+    ordered = sorted(profiles.items(), key=lambda item: -sum(timing["wall"] for timing in item[1].values()))
+    for path, timings in ordered:
+        row(path, timings)
+    row("total", summarize_profiles(profiles))
+
+
+def save_profiles(profiles: dict, path: str):
+    """
+    Function to save the stage timings of the notebooks as JSON.
+    :param profiles: dict: the stage timings of each notebook, by path
+    :param path: str: the path to the JSON file
+    :return: nothing
+    """
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"stages": STAGES, "totals": summarize_profiles(profiles), "notebooks": profiles}, f, indent=2)
@@ -0,0 +1,146 @@
+"""
+This file contains the render cache, the persistent cache of the markdown rendered for each cell by the native renderer.
+The cache is a SQLite database stored per repository (in .git/obsidianize/render_cache.sqlite, so it is never
+committed) mapping the key of a cell (the hash of the converter source, of its lines, and of the state of the
+formatter and the assets context when the cell may embed displays, see native_md.render_markdown) to its fragment: the
+lines it adds to the markdown, the display counters it increments and the assets it embeds. Its size is bounded, the
+least recently used fragments are evicted first.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from obsidianize.src.utils.manifest import get_cache_folder
+
+RENDER_CACHE_NAME = "render_cache.sqlite"
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fragments (
+    key BLOB PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fragments_used ON fragments (used);
+"""
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class RenderCache:
+    """
+    Persistent, size-bounded LRU cache of the rendered cells of the notebooks of a repository.
+    The fragments read and added are kept in memory until flush, which writes them in a single transaction.
+    """
+
+    def __init__(self, repo_path: str, max_bytes: int = MAX_CACHE_BYTES):
+        self.repo_path = repo_path
+        self.path = os.path.join(get_cache_folder(repo_path), RENDER_CACHE_NAME)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # Keys of the fragments read since the last flush, and fragments added since the last flush
+        self._used = set()
+        self._added = {}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # The connection is shared by the threads of the daemon, under self.lock
+        self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.executescript(_SCHEMA)
+
+    def get(self, key: bytes):
+        """
+        Function to get the fragment of a cell.
+        :param key: bytes: the key of the cell
+        :return: tuple: (lines, counters, embeds) with counters the dict of the display counters incremented and embeds
+        the list of the (display type, title, link) embedded, or None if the cell is not in the cache
+        """
+        with self.lock:
+            value = self._added.get(key)
+            if value is None:
+                row = self.connection.execute("SELECT value FROM fragments WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                value = row[0]
+                self._used.add(key)
+        lines, counters, embeds = json.loads(value)
+        return lines, counters, [tuple(embed) for embed in embeds]
+
+    def put(self, key: bytes, lines: list, counters: dict, embeds: list):
+        """
+        Function to add the fragment of a cell (written by the next flush).
+        :param key: bytes: the key of the cell
+        :param lines: list: the lines the cell adds to the markdown
+        :param counters: dict: the display counters the cell increments, by display type
+        :param embeds: list: the (display type, title, link) of each asset the cell embeds
+        :return: nothing
+        """
+        value = json.dumps([lines, counters, embeds], ensure_ascii=False)
+        with self.lock:
+            self._added[key] = value
+
+    def flush(self):
+        """
+        Function to write the fragments added and the use of the fragments read, then evict the least recently used
+        fragments if the cache is larger than max_bytes.
+        :return: nothing
+        """
+        with self.lock:
+            if not self._used and not self._added:
+                return
+            now = time.time()
+            with self.connection:
+                self.connection.executemany("UPDATE fragments SET used = ? WHERE key = ?",
+                                            ((now, key) for key in self._used))
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO fragments (key, value, size, used) VALUES (?, ?, ?, ?)",
+                    ((key, value, len(key) + len(value.encode("utf-8")), now) for key, value in self._added.items())
+                )
+                if self._added:
+                    self._evict()
+            self._used = set()
+            self._added = {}
+
+    def _evict(self):
+        # Called under self.lock, in the transaction of flush
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM fragments").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self.connection.execute("SELECT key, size FROM fragments ORDER BY used"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.connection.executemany("DELETE FROM fragments WHERE key = ?", evicted)
+
+    def clear(self):
+        """
+        Function to empty the cache.
+        :return: nothing
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM fragments")
+            self._used = set()
+            self._added = {}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def get_render_cache(repo_path: str) -> RenderCache:
+    """
+    Function to get the render cache of a repository, shared by the whole process.
+    :param repo_path: str: the path to the repository
+    :return: RenderCache: the cache
+    """
+    repo_path = os.path.abspath(repo_path)
+    with _caches_lock:
+        cache = _caches.get(repo_path)
+        if cache is None:
+            cache = _caches[repo_path] = RenderCache(repo_path)
+        return cache
@@ -0,0 +1,110 @@
+"""
+This file contains the report of a batch conversion, used by the CLI to print a summary of what has been done.
+"""
+import time
+
+
+class ConversionReport:
+    """
+    Summary of a batch conversion: the converted notebooks with their timings (and, among them, the ones whose markdown
+    file came out identical and was left untouched), the notebooks skipped because their markdown file was already up
+    to date, and the notebooks whose conversion failed.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.end = None
+        self.converted = []
+        self.unchanged = []
+        self.skipped = []
+        self.failed = []
+        # Stage timings of each notebook, when the conversion is profiled
+        self.profiles = {}
+        # Hits and misses of the markdown exporter caches of the processes converting the notebooks
+        self.exporter_cache = {"hits": 0, "misses": 0}
+
+    def add_converted(self, path: str, seconds: float, written: bool = True):
+        self.converted.append((path, seconds))
+        if not written:
+            self.unchanged.append(path)
+
+    def add_skipped(self, path: str):
+        self.skipped.append(path)
+
+    def add_failed(self, path: str, error: str):
+        self.failed.append((path, error))
+
+    def add_exporter_cache(self, hits: int, misses: int):
+        self.exporter_cache["hits"] += hits
+        self.exporter_cache["misses"] += misses
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    @property
+    def total(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+    def to_dict(self) -> dict:
+        """
+        Function to get the report as a JSON serializable dictionary (e.g. to send it back from the daemon).
+        :return: dict: the report
+        """
+        return {
+            "total": self.total,
+            "converted": self.converted,
+            "unchanged": self.unchanged,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "exporter_cache": self.exporter_cache,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ConversionReport":
+        """
+        Function to rebuild a report from its dictionary.
+        :param data: dict: the report, as returned by to_dict
+        :return: ConversionReport: the report
+        """
+        report = cls()
+        report.converted = [tuple(item) for item in data["converted"]]
+        report.unchanged = list(data.get("unchanged", []))
+        report.skipped = list(data["skipped"])
+        report.failed = [tuple(item) for item in data["failed"]]
+        report.exporter_cache = dict(data.get("exporter_cache", report.exporter_cache))
+        report.end = report.start + data["total"]
+        return report
+
+    def print_summary(self, timings: bool = False):
+        """
+        Function to print the summary of the batch conversion.
+        :param timings: bool: also print the conversion time of each notebook, and the statistics of the markdown
+        exporter cache
+        :return: nothing
+        """
+        if timings:
+            for path, seconds in self.converted:
+                print(f"  {seconds:8.3f}s  {path}")
+            self.print_exporter_cache()
+        for path, error in self.failed:
+            print(f"Failed to convert {path}: {error}")
+        summary = f"{len(self.converted)} notebook(s) converted in {self.total:.3f}s"
+        if self.converted and self.total > 0:
+            summary += f" ({len(self.converted) / self.total:.1f} notebooks/s)"
+        if self.converted:
+            summary += f", {len(self.converted) - len(self.unchanged)} written, {len(self.unchanged)} unchanged"
+        if self.skipped:
+            summary += f", {len(self.skipped)} up to date"
+        if self.failed:
+            summary += f", {len(self.failed)} failed"
+        print(summary)
+
+    def print_exporter_cache(self):
+        """
+        Function to print the hits and misses of the markdown exporter cache (a miss per process means that the
+        templates were compiled once per process).
+        :return: nothing
+        """
+        hits, misses = self.exporter_cache["hits"], self.exporter_cache["misses"]
+        print(f"markdown exporter cache: {hits} hit(s), {misses} miss(es)")
@@ -1,16 +1,50 @@
+import hashlib
 import os
+import threading
 
+from obsidianize.src.utils.manifest import hash_file
 
-def save_markdown(markdown: str, path: str):
+
+def write_if_changed(content: str, path: str) -> bool:
     """
-    Function to save a markdown string to a file.
-    :param markdown:
-    :param path:
-    :return:
+    Function to write a text file only if its content changes.
+    The existing file is compared by size first, then by content hash, so that identical files keep their modification
+    time (and are not re-indexed by Obsidian or sync clients). Real writes go through a temporary file in the same
+    folder, renamed over the file, so that an interrupted write never leaves a truncated file.
+    :param content: str: the content of the file
+    :param path: str: the path to the file
+    :return: bool: True if the file has been written, False if it was already identical
     """
+    data = content.encode('utf-8')
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = None
+    if size == len(data) and hash_file(path) == hashlib.blake2b(data, digest_size=20).hexdigest():
+        return False
 
-    md_path = path.replace('.ipynb', '.md')
-    with open(md_path, 'w', encoding='utf-8') as md_file:
-        md_file.write(markdown)
+    folder, name = os.path.split(os.path.abspath(path))
+    tmp_path = os.path.join(folder, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    # 0o666 lets the umask decide the permissions, as for a file opened with open(path, 'w')
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
 
-    print(f"Notebook {os.path.basename(path)} has been processed and saved to {md_path}.")
+
+def save_markdown(markdown: str, path: str) -> bool:
+    """
+    Function to save a markdown string to the markdown file of a notebook, if it changed.
+    :param markdown: str: the markdown content
+    :param path: str: the path to the notebook (the markdown file is saved next to it)
+    :return: bool: True if the markdown file has been written, False if it was already up to date
+    """
+
+    md_path = path.replace('.ipynb', '.md')
+    return write_if_changed(markdown, md_path)
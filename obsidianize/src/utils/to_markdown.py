@@ -1,16 +1,91 @@
-# Import the markdown exporter
-from nbconvert import MarkdownExporter
+import json
+import threading
+from collections import namedtuple
 
+ExporterCacheInfo = namedtuple("ExporterCacheInfo", ["hits", "misses", "size"])
 
-def convert_to_markdown(notebook):
+# The markdown exporters are built once per process and per configuration, and shared by all the conversions of this
+# process (template discovery, Jinja environment, template compilation and preprocessors are only set up once)
+_EXPORTERS = {}
+_EXPORTERS_LOCK = threading.Lock()
+_CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+class _CachedExporter:
+    """
+    A markdown exporter shared by the threads of the process, with a lock serialising its use.
+    """
+
+    def __init__(self, config: dict):
+        # Import the markdown exporter here, nbconvert is slow to import and only needed when a notebook is converted
+        from nbconvert import MarkdownExporter
+        from traitlets.config import Config
+
+        self.exporter = MarkdownExporter(config=Config(config))
+        # Load and compile the template now rather than on the first notebook
+        _ = self.exporter.template
+        self.lock = threading.Lock()
+
+    def from_notebook_node(self, notebook):
+        with self.lock:
+            return self.exporter.from_notebook_node(notebook)
+
+
+def _config_key(config: dict) -> str:
+    return json.dumps(config, sort_keys=True, default=repr)
+
+
+def get_markdown_exporter(config: dict = None) -> _CachedExporter:
+    """
+    Function to get the markdown exporter of this process for a configuration, building it on first use.
+    :param config: dict: the traitlets configuration of the exporter (e.g. {"MarkdownExporter": {...}}), None for the
+    default configuration
+    :return: _CachedExporter: the cached markdown exporter
+    """
+    config = config or {}
+    key = _config_key(config)
+    with _EXPORTERS_LOCK:
+        cached = _EXPORTERS.get(key)
+        if cached is not None:
+            _CACHE_STATS["hits"] += 1
+            return cached
+        _CACHE_STATS["misses"] += 1
+        # Build the exporter while holding the lock, so that concurrent threads wait for it instead of building it twice
+        cached = _CachedExporter(config)
+        _EXPORTERS[key] = cached
+        return cached
+
+
+def exporter_cache_info() -> ExporterCacheInfo:
+    """
+    Function to get the statistics of the exporter cache, e.g. to check that templates are compiled once in a batch.
+    :return: ExporterCacheInfo: the number of hits, misses, and the number of cached exporters
+    """
+    with _EXPORTERS_LOCK:
+        return ExporterCacheInfo(_CACHE_STATS["hits"], _CACHE_STATS["misses"], len(_EXPORTERS))
+
+
+def clear_exporter_cache():
+    """
+    Function to empty the exporter cache and reset its statistics.
+    :return: nothing
+    """
+    with _EXPORTERS_LOCK:
+        _EXPORTERS.clear()
+        _CACHE_STATS["hits"] = 0
+        _CACHE_STATS["misses"] = 0
+
+
+def convert_to_markdown(notebook, config: dict = None):
     """
     Function to convert a jupyter notebook to a markdown string.
     :param notebook: notebook: the notebook to convert
+    :param config: dict: the traitlets configuration of the exporter, None for the default configuration
     :return: str: the markdown string
     """
 
-    # Create the markdown exporter
-    exporter = MarkdownExporter()
+    # Get the markdown exporter
+    exporter = get_markdown_exporter(config)
 
     # Convert the notebook to markdown
     markdown, _ = exporter.from_notebook_node(notebook)
@@ -1,41 +1,35 @@
 import os
-from pathlib import Path
 
-from obsidianize.src.utils.path_utils import get_assets_path, get_vault_root
-from obsidianize.src.utils.sanitize import get_figure_title
+from obsidianize.src.placeholder_fun.large_frames import SIDE_FILE_EXTENSIONS
 
 
 def view_pandas(
-        line: str,
+        figure_title,
         display_queue: list,
         display_counter: dict,
-        notebook_path: str,
+        context,
 ):
     """
     Function to process a pandas DataFrame.
-    :param line: str: the line to process
+    :param figure_title: str: the title of the display (None if no title was given)
     :param display_queue: list: the list of displays
     :param display_counter: dict: the list of figure counters
-    :param notebook_path: str: the path of the notebook
-    :param path: str: the path to the notebook
+    :param context: ConversionContext: the paths of the notebook being converted
     :return: nothing
     """
 
-    # Get the figure title
-    figure_title = get_figure_title(line)
-
     # If the figure title is None, set it to the figure counter
     if figure_title is None:
         figure_title = f"pandas_{display_counter['pandas']}"
 
-    # Get the assets folder for this notebook
-    assets_folder = get_assets_path(notebook_path)
-
-    # Copy the content of the pandas DataFrame formated as a markdonw table in a file and embed it in the markdown
-    assets_folder = get_assets_path(notebook_path)
-    obsidian_vault_path = get_vault_root(notebook_path)
-    assets_folder = Path(assets_folder).relative_to(obsidian_vault_path)
+    # The content of the pandas DataFrame is saved as a markdown table in a file, embed it in the markdown
+    assets_folder = context.assets_link_folder
     display_queue.append(f"![{figure_title}]({os.path.join(assets_folder, figure_title)}.md)")
+    # Large DataFrames are embedded as a preview, link the side file holding the full data
+    for extension in SIDE_FILE_EXTENSIONS:
+        if f"{figure_title}.{extension}" in context.assets_files:
+            display_queue.append(f"[{figure_title} (full data)]({os.path.join(assets_folder, figure_title)}.{extension})")
+            break
     display_queue.append("\n")
 
     # Increment the figure counter
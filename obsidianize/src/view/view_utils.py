@@ -1,6 +1,7 @@
 """
 This file contains the utils functions used in the view module of the obsidianize package.
 """
+import functools
 from pathlib import Path
 from .pyplot import view_pyplot
 from .pandas import view_pandas
@@ -12,13 +13,19 @@ def get_supported_display_types() -> list:
     Function to get the list of supported display types.
     :return: list: the list of supported display types
     """
+    return list(_find_supported_display_types())
+
+
+@functools.lru_cache(maxsize=None)
+def _find_supported_display_types() -> tuple:
+    # The view folder is only listed once per process
     view_folder_path = Path(__file__).parent
     view_files = view_folder_path.glob('*.py')
     # Remove the __init__.py file and the view_utils.py file
     view_files = [file for file in view_files if file.stem != '__init__' and file.stem != 'view_utils']
     # Get the list of supported display types
     supported_display_types = [file.stem for file in view_files]
-    return supported_display_types
+    return tuple(supported_display_types)
 
 
 def pick_view(
@@ -39,22 +46,22 @@ def pick_view(
 
 def view(
         which_view: str,
-        line: str,
+        figure_title,
         display_queue: list,
         display_counter: dict,
-        notebook_path: str,
+        context,
 ):
     """
     Function to call the appropriate view function.
     :param which_view: str: the name of the view function to call
-    :param line: str: the line to process
+    :param figure_title: str: the title of the display (None if no title was given)
     :param display_queue: list: the list of displays
     :param display_counter: dict: the list of figure counters
-    :param notebook_path: str: the name of the notebook
+    :param context: ConversionContext: the paths of the notebook being converted
     :return: nothing
     """
 
     # Get the view function
     view_function = globals()["view_" + which_view]
     # Call the view function
-    view_function(line=line, display_queue=display_queue, display_counter=display_counter, notebook_path=notebook_path)
+    view_function(figure_title=figure_title, display_queue=display_queue, display_counter=display_counter, context=context)
@@ -4,7 +4,7 @@ setup(
     name='obsidianize',
     description='A package to convert jupyter notebooks to markdown files for use in Obsidian',
     version='1.0.0',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     include_package_data=True,
     install_requires=[
         'nbformat',
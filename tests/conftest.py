@@ -0,0 +1,22 @@
+import os
+import shutil
+
+import pytest
+
+EXEMPLE_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "exemple")
+
+
+@pytest.fixture
+def exemple_vault(tmp_path):
+    """
+    Fixture copying the exemple folder to a repository in a vault, with the assets of its notebook in the assets
+    folder of the repository.
+    :return: Path: the path to the copy of the exemple folder
+    """
+    repo = tmp_path / "vault" / "repo"
+    os.makedirs(tmp_path / "vault" / ".obsidian")
+    os.makedirs(repo / ".git")
+    folder = repo / "exemple"
+    shutil.copytree(EXEMPLE_FOLDER, folder, ignore=shutil.ignore_patterns("assets"))
+    shutil.copytree(os.path.join(EXEMPLE_FOLDER, "assets"), repo / "assets" / "exemple")
+    return folder
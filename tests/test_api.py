@@ -0,0 +1,51 @@
+import os
+
+import nbformat
+from nbformat.v4 import new_code_cell, new_notebook
+
+from obsidianize import convert_notebook, iter_convert_notebooks
+from obsidianize.api import Embed
+from obsidianize.src.utils.context import ConversionContext
+from obsidianize.src.utils.native_md import render_markdown
+
+
+def _list_files(folder) -> list:
+    return sorted(os.path.join(path, name) for path, _, names in os.walk(folder) for name in names)
+
+
+def test_in_memory_conversion_writes_no_file(tmp_path):
+    notebook = new_notebook(cells=[new_code_cell("x = 1\nobsidian_pyplot(figure, 'Loss curve')")],
+                            metadata={"language_info": {"name": "python"}})
+    repo_root = tmp_path / "vault" / "repo"
+
+    result = convert_notebook(notebook, "analysis/notebook.ipynb", repo_root=str(repo_root),
+                              vault_root=str(tmp_path / "vault"))
+
+    assert result.notebook_path == str(repo_root / "analysis" / "notebook.ipynb")
+    assert result.markdown == (
+        "```run-python\n"
+        "x = 1\n"
+        "obsidian_pyplot(figure, 'Loss curve')\n"
+        "```\n"
+        "\n"
+        "#### Results\n"
+        "![Loss-curve](repo/assets/analysis/Loss-curve.png)\n"
+    )
+    assert result.embeds == [Embed("pyplot", "Loss-curve", "repo/assets/analysis/Loss-curve.png")]
+    # Neither the repository nor the vault exist
+    assert os.listdir(tmp_path) == []
+
+
+def test_in_memory_conversion_matches_the_files(exemple_vault):
+    path = exemple_vault / "Dummy Notebook.ipynb"
+    repo_root = exemple_vault.parent
+    files = _list_files(repo_root.parent)
+    data = path.read_bytes()
+
+    results = list(iter_convert_notebooks([(data, "exemple/Dummy Notebook.ipynb")], repo_root=str(repo_root),
+                                          vault_root=str(repo_root.parent)))
+
+    assert [result.notebook_path for result in results] == [str(path)]
+    expected = render_markdown(nbformat.reads(data, as_version=4), str(path), ConversionContext(str(path)))
+    assert results[0].markdown == expected
+    assert _list_files(repo_root.parent) == files
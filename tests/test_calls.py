@@ -0,0 +1,39 @@
+from obsidianize.src.utils.calls import ObsidianCall, clear_call_cache, find_obsidian_calls
+
+
+def test_multiline_calls_and_keywords():
+    source = (
+        "import obsidianize\n"
+        "obsidian_pyplot(\n"
+        "    figure,\n"
+        "    'Loss curve',\n"
+        ")\n"
+        "obsidianize.obsidian_pandas(frame, title=\"Scores\")\n"
+    )
+    assert find_obsidian_calls(source) == (
+        ObsidianCall("pyplot", "Loss-curve", 2),
+        ObsidianCall("pandas", "Scores", 6),
+    )
+
+
+def test_calls_in_comments_and_strings_are_ignored():
+    source = (
+        "# obsidian_pyplot(figure, 'commented')\n"
+        "text = \"obsidian_plotly(figure, 'in a string')\"\n"
+        "obsidian_plotly(figure, 'real')\n"
+    )
+    assert find_obsidian_calls(source) == (ObsidianCall("plotly", "real", 3),)
+
+
+def test_ipython_syntax_is_blanked_out():
+    source = "%matplotlib inline\n!pip list\nobsidian_pyplot(figure, 'after magics')\n"
+    assert find_obsidian_calls(source) == (ObsidianCall("pyplot", "after-magics", 3),)
+
+
+def test_invalid_cells_fall_back_to_the_line_matcher():
+    clear_call_cache()
+    source = "obsidian_pyplot(figure, 'first')\nif True\nobsidian_pandas(frame, 'second')\n"
+    assert find_obsidian_calls(source) == (
+        ObsidianCall("pyplot", "first", 1),
+        ObsidianCall("pandas", "second", 3),
+    )
@@ -0,0 +1,18 @@
+import os
+
+from obsidianize.scripts.daemon import ConversionService
+
+
+def test_daemon_converts_a_batch_with_workers(tmp_path):
+    os.mkdir(tmp_path / ".git")
+    os.mkdir(tmp_path / ".obsidian")
+    paths = []
+    for name in ("first", "second", "third"):
+        path = tmp_path / f"{name}.ipynb"
+        path.write_text('{"cells": [], "metadata": {}, "nbformat": 4, "nbformat_minor": 5}')
+        paths.append(str(path))
+
+    report = ConversionService(engine="native").convert(paths, jobs=2)
+
+    assert sorted(path for path, _ in report["converted"]) == paths
+    assert report["failed"] == []
@@ -0,0 +1,27 @@
+import os
+
+from obsidianize.src.utils.discovery import NotebookDiscovery
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("")
+
+
+def test_repository_gitignore_applies_below_its_root(tmp_path):
+    repo = tmp_path / "repo"
+    os.makedirs(repo / ".git")
+    with open(repo / ".gitignore", "w") as f:
+        f.write("drafts/\n*.tmp.ipynb\n/sub/anchored.ipynb\n/build/\n")
+    for name in ("sub/kept.ipynb", "sub/scratch.tmp.ipynb", "sub/anchored.ipynb", "sub/drafts/draft.ipynb",
+                 "build/out.ipynb"):
+        _touch(str(repo / name))
+
+    from_repo = [path for path in NotebookDiscovery(str(repo)).iter_notebooks() if "/sub/" in path]
+    from_sub = list(NotebookDiscovery(str(repo / "sub")).iter_notebooks())
+    assert from_repo == from_sub == [str(repo / "sub" / "kept.ipynb")]
+    assert list(NotebookDiscovery(str(repo / "build")).iter_notebooks()) == []
+    assert not NotebookDiscovery(str(repo / "sub")).accepts(str(repo / "sub" / "anchored.ipynb"))
+    # Without the .gitignore files, everything is listed
+    assert len(list(NotebookDiscovery(str(repo / "sub"), gitignore=False).iter_notebooks())) == 4
@@ -0,0 +1,43 @@
+import os
+
+import matplotlib
+import pytest
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+from obsidianize import get_export_stats, obsidian_pyplot  # noqa: E402
+
+
+@pytest.fixture
+def savefig_calls(monkeypatch):
+    calls = []
+    savefig = Figure.savefig
+
+    def counting_savefig(self, *args, **kwargs):
+        calls.append(args)
+        return savefig(self, *args, **kwargs)
+
+    monkeypatch.setattr(Figure, "savefig", counting_savefig)
+    return calls
+
+
+def test_pyplot_figure_is_rendered_once(exemple_vault, savefig_calls, monkeypatch):
+    monkeypatch.setattr(plt, "show", lambda *args, **kwargs: None)
+    notebook = str(exemple_vault / "Dummy Notebook.ipynb")
+    figure = plt.figure()
+    plt.plot([1, 2, 3])
+
+    obsidian_pyplot(figure, "rendered once", path_to_notebook=notebook)
+    assert len(savefig_calls) == 1
+    path = exemple_vault.parent / "assets" / "exemple" / "rendered-once.png"
+    assert os.path.getsize(path) > 0
+
+    # Unchanged, the export is skipped
+    hits = get_export_stats().get("pyplot", {}).get("hits", 0)
+    obsidian_pyplot(figure, "rendered once", path_to_notebook=notebook)
+    assert len(savefig_calls) == 2
+    assert get_export_stats()["pyplot"]["hits"] == hits + 1
+    plt.close(figure)
@@ -0,0 +1,43 @@
+import os
+
+from obsidianize.scripts.gc import collect_garbage
+from obsidianize.src.utils.asset_manifest import get_asset_manifest
+
+
+def _write(path, content: str = ""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def test_gc_only_deletes_unreferenced_exports(tmp_path):
+    vault = tmp_path / "vault"
+    repo = vault / "repo"
+    os.makedirs(vault / ".obsidian")
+    os.makedirs(repo / ".git")
+    assets = repo / "assets"
+    notebook = str(repo / "notebook.ipynb")
+    manifest = get_asset_manifest(str(repo))
+    exports = {
+        "embedded": assets / "embedded.png",
+        "bare": assets / "bare.png",
+        "outside": assets / "outside.png",
+        "stale": assets / "stale.png",
+    }
+    for title, path in exports.items():
+        _write(str(path))
+        manifest.record(str(path), [str(path)], notebook, "pyplot", title, "fingerprint")
+    _write(str(assets / "manual.pdf"))
+    _write(str(assets / "sub" / "diagram.png"))
+    _write(str(repo / "notebook.md"), "![embedded](repo/assets/embedded.png)\n![[bare.png]]\n")
+    # A note of the vault, outside of the repository
+    _write(str(vault / "note.md"), "[link](repo/assets/outside.png)\n")
+
+    orphans = collect_garbage(str(repo), dry_run=True)
+    assert [path for path, _ in orphans] == [str(exports["stale"])]
+
+    collect_garbage(str(repo))
+    assert not os.path.exists(exports["stale"])
+    for path in (exports["embedded"], exports["bare"], exports["outside"], assets / "manual.pdf",
+                 assets / "sub" / "diagram.png"):
+        assert os.path.exists(path)
@@ -0,0 +1,35 @@
+import os
+
+from obsidianize.scripts.git_changes import NotebookChange, apply_notebook_changes
+from obsidianize.src.utils.asset_manifest import get_asset_manifest
+
+
+def _write(path, content: str = ""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def test_renamed_notebook_moves_its_assets(tmp_path):
+    vault = tmp_path / "vault"
+    repo = vault / "repo"
+    os.makedirs(vault / ".obsidian")
+    os.makedirs(repo / ".git")
+    old_notebook = str(repo / "old" / "notebook.ipynb")
+    new_notebook = str(repo / "new" / "notebook.ipynb")
+    old_assets = repo / "assets" / "old"
+    new_assets = repo / "assets" / "new"
+    _write(new_notebook, "{}")
+    # Embedded with a link from the vault root, and with a link without a folder
+    _write(str(repo / "old" / "notebook.md"), "![linked](repo/assets/old/linked.png)\n![[bare.png]]\n")
+    for name in ("linked.png", "linked.svg", "bare.png", "recorded.png", "other.png"):
+        _write(str(old_assets / name))
+    recorded = str(old_assets / "recorded.png")
+    get_asset_manifest(str(repo)).record(recorded, [recorded], old_notebook, "pyplot", "recorded", "fingerprint")
+
+    to_convert = apply_notebook_changes(str(repo), [NotebookChange("R", new_notebook, old_notebook, 100)])
+
+    assert to_convert == [new_notebook]
+    assert os.path.exists(repo / "new" / "notebook.md")
+    assert sorted(os.listdir(new_assets)) == ["bare.png", "linked.png", "linked.svg", "recorded.png"]
+    assert os.listdir(old_assets) == ["other.png"]
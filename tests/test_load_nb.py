@@ -0,0 +1,57 @@
+import json
+
+import nbformat
+import pytest
+
+from obsidianize.src.utils.context import ConversionContext
+from obsidianize.src.utils.load_nb import load_notebook, stream_notebook_dict
+from obsidianize.src.utils.native_md import render_markdown
+
+# Strings with escapes and non-ASCII characters, so that the chunk boundaries fall inside them
+SOURCE = 'print("a \\"quoted\\" word")\n# backslash \\\\ then é, 😀 and é\t\\n'
+
+
+def test_fast_loader_matches_nbformat(exemple_vault):
+    path = str(exemple_vault / "Dummy Notebook.ipynb")
+    notebook, complete = load_notebook(path, "fast")
+
+    assert complete
+    assert notebook == nbformat.read(path, as_version=4)
+
+
+def test_stream_loader_renders_like_nbformat(exemple_vault):
+    path = str(exemple_vault / "Dummy Notebook.ipynb")
+    expected = nbformat.read(path, as_version=4)
+    notebook, complete = load_notebook(path, "stream")
+
+    assert not complete
+    assert [cell.source for cell in notebook.cells] == [cell.source for cell in expected.cells]
+    assert render_markdown(notebook, path, ConversionContext(path)) == render_markdown(
+        expected, path, ConversionContext(path))
+
+
+@pytest.mark.parametrize("ensure_ascii", [False, True])
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64])
+def test_stream_parser_across_chunk_boundaries(tmp_path, chunk_size, ensure_ascii):
+    cell = {
+        "cell_type": "code",
+        "execution_count": None,
+        "metadata": {"tags": ["é", "\\"], "scrolled": False, "ratio": -1.5e-3},
+        "outputs": [
+            {"output_type": "stream", "name": "stdout", "text": [SOURCE, "\\\\\\"]},
+            {"output_type": "display_data", "metadata": {},
+             "data": {"text/html": [SOURCE], "image/png": "iVBORw0KGgo\\/"}},
+        ],
+        "source": [SOURCE, "😀"],
+    }
+    notebook = {"cells": [cell], "metadata": {}, "nbformat": 4, "nbformat_minor": 5}
+    path = tmp_path / "notebook.ipynb"
+    # With ensure_ascii, the non-ASCII characters are \u escapes (and surrogate pairs) split across the chunks too
+    path.write_text(json.dumps(notebook, ensure_ascii=ensure_ascii, indent=1), encoding="utf-8")
+
+    parsed = stream_notebook_dict(str(path), chunk_size=chunk_size)
+
+    # The outputs that never reach the markdown file are emptied, the others are kept as they are
+    cell["outputs"][0]["text"] = []
+    cell["outputs"][1]["data"]["image/png"] = ""
+    assert parsed == notebook
@@ -0,0 +1,64 @@
+import os
+
+from obsidianize.scripts.convert import convert_notebooks_to_md
+from obsidianize.src.utils.manifest import ConversionManifest, get_cache_folder
+
+
+def _write(path: str, content: str):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def test_notebook_saved_during_conversion_is_converted_again(tmp_path):
+    os.mkdir(tmp_path / ".git")
+    notebook = str(tmp_path / "notebook.ipynb")
+    _write(notebook, '{"cells": []}')
+    _write(notebook.replace(".ipynb", ".md"), "")
+    manifest = ConversionManifest(str(tmp_path))
+
+    state = manifest.snapshot(notebook)
+    # Saved while the markdown file is made from the previous content
+    _write(notebook, '{"cells": [1]}')
+    manifest.record(notebook, state)
+
+    assert not manifest.is_up_to_date(notebook)
+    manifest.record(notebook)
+    assert manifest.is_up_to_date(notebook)
+
+
+def test_cache_folder_follows_the_gitdir_pointer(tmp_path):
+    # Worktrees and submodules have a .git file pointing to their git folder
+    git_folder = tmp_path / "main" / ".git" / "worktrees" / "feature"
+    os.makedirs(git_folder)
+    worktree = tmp_path / "feature"
+    os.mkdir(worktree)
+    _write(str(worktree / ".git"), "gitdir: ../main/.git/worktrees/feature\n")
+
+    assert get_cache_folder(str(worktree)) == str(git_folder / "obsidianize")
+
+
+def test_cache_folder_outside_of_git_is_excluded(tmp_path):
+    os.makedirs(tmp_path / ".git" / "info")
+    _write(str(tmp_path / ".git" / "info" / "exclude"), "*.log")
+    vault = tmp_path / "vault"
+    os.mkdir(vault)
+
+    assert get_cache_folder(str(vault)) == str(vault / ".obsidianize")
+    get_cache_folder(str(vault))
+    with open(tmp_path / ".git" / "info" / "exclude") as f:
+        assert f.read() == "*.log\n/vault/.obsidianize/\n"
+
+
+def test_notebooks_are_converted_again_with_other_options(tmp_path):
+    os.mkdir(tmp_path / ".git")
+    os.mkdir(tmp_path / ".obsidian")
+    notebook = str(tmp_path / "notebook.ipynb")
+    _write(notebook, '{"cells": [], "metadata": {}, "nbformat": 4, "nbformat_minor": 5}')
+
+    def convert(engine: str) -> tuple:
+        report = convert_notebooks_to_md([notebook], jobs=1, engine=engine)
+        return len(report.converted), len(report.skipped)
+
+    assert convert("native") == (1, 0)
+    assert convert("native") == (0, 1)
+    assert convert("nbconvert") == (1, 0)
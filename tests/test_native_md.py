@@ -0,0 +1,54 @@
+import os
+
+import nbformat
+
+from obsidianize.scripts.convert import convert_notebook_to_md, render_notebook
+from obsidianize.src.utils import manifest
+from obsidianize.src.utils.context import ConversionContext
+from obsidianize.src.utils.native_md import render_markdown
+from obsidianize.src.utils.render_cache import RenderCache, get_render_cache
+
+
+def test_engines_render_the_same_markdown(exemple_vault):
+    path = str(exemple_vault / "Dummy Notebook.ipynb")
+    notebook = nbformat.read(path, as_version=4)
+
+    native = render_markdown(notebook, path, ConversionContext(path))
+    assert native == render_notebook(notebook, path, "nbconvert", ConversionContext(path))
+    assert "![" in native
+
+
+def _convert(path: str, render_cache: bool = True) -> bytes:
+    markdown_path = path.replace(".ipynb", ".md")
+    if os.path.exists(markdown_path):
+        os.remove(markdown_path)
+    convert_notebook_to_md(path, engine="native", render_cache=render_cache)
+    with open(markdown_path, "rb") as f:
+        return f.read()
+
+
+def test_render_cache_gives_the_same_markdown(exemple_vault, monkeypatch):
+    path = str(exemple_vault / "Dummy Notebook.ipynb")
+    get_render_cache(str(exemple_vault.parent)).clear()
+    hits = []
+    get = RenderCache.get
+
+    def counting_get(self, key):
+        fragment = get(self, key)
+        hits.append(fragment is not None)
+        return fragment
+
+    monkeypatch.setattr(RenderCache, "get", counting_get)
+
+    cold = _convert(path)
+    assert hits and not any(hits)
+    hits.clear()
+    warm = _convert(path)
+    assert hits and all(hits)
+    assert warm == cold == _convert(path, render_cache=False)
+
+    # The cells rendered by another version of the renderer are rendered again
+    monkeypatch.setattr(manifest, "get_source_hash", lambda: "another renderer")
+    hits.clear()
+    assert _convert(path) == cold
+    assert hits and not any(hits)
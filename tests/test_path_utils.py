@@ -0,0 +1,17 @@
+import os
+
+from obsidianize.src.utils.path_utils import find_ancestor_with
+
+
+def test_marker_created_after_a_miss_is_found(tmp_path):
+    folder = tmp_path / "vault" / "notes"
+    os.makedirs(folder)
+    assert find_ancestor_with(str(folder), ".obsidian") is None
+
+    os.mkdir(tmp_path / "vault" / ".obsidian")
+    assert find_ancestor_with(str(folder), ".obsidian") == str(tmp_path / "vault")
+    # Cached for the folders visited
+    assert find_ancestor_with(str(folder), ".obsidian") == str(tmp_path / "vault")
+
+    os.rmdir(tmp_path / "vault" / ".obsidian")
+    assert find_ancestor_with(str(folder), ".obsidian") is None
@@ -0,0 +1,40 @@
+"""
+This file contains the startup tests of the CLI: running it must not load the heavy dependencies, which are only
+needed by the placeholder functions (and nbconvert, only needed when a notebook is exported with it).
+"""
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ("matplotlib", "plotly", "pandas", "numpy", "IPython", "nbconvert")
+
+
+def _loaded_heavy_modules(*args: str) -> set:
+    """
+    Function to run the console entry point of the CLI in a new interpreter.
+    :param args: str: the command line arguments
+    :return: set: the heavy modules loaded when the command exits
+    """
+    code = (
+        "import sys\n"
+        f"sys.argv = ['obsidianize', *{args!r}]\n"
+        "from obsidianize.scripts.__main__ import main_cli\n"
+        "try:\n"
+        "    main_cli()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules), file=sys.stderr)\n"
+    )
+    env = dict(os.environ, PAGER="cat")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+    last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else ""
+    return set(filter(None, last_line.split(",")))
+
+
+def test_help_does_not_load_heavy_modules():
+    # Fire itself imports IPython to format the help, when it is installed
+    assert _loaded_heavy_modules("--help") <= {"IPython"}
+
+
+def test_native_conversion_does_not_load_heavy_modules(tmp_path):
+    assert _loaded_heavy_modules("convert", str(tmp_path), "--engine", "native", "--daemon", "False") == set()
@@ -0,0 +1,15 @@
+from nbformat.v4 import new_code_cell, new_notebook
+
+from obsidianize.src.utils.to_markdown import clear_exporter_cache, convert_to_markdown, exporter_cache_info
+
+
+def test_exporter_is_built_once():
+    clear_exporter_cache()
+    notebook = new_notebook(cells=[new_code_cell("x = 1")])
+    first = convert_to_markdown(notebook)
+    second = convert_to_markdown(notebook)
+
+    assert first == second
+    assert exporter_cache_info() == (1, 1, 1)
+    clear_exporter_cache()
+    assert exporter_cache_info() == (0, 0, 0)
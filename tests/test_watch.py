@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+from obsidianize.scripts import watch
+from obsidianize.src.utils.discovery import NotebookDiscovery
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/fd"), reason="needs /proc")
+def test_inotify_fd_is_closed_when_a_watch_fails(tmp_path, monkeypatch):
+    def fail(self, folder):
+        raise OSError(28, "inotify_add_watch failed")
+
+    monkeypatch.setattr(watch.InotifyWatcher, "_add_watch", fail)
+    fds = set(os.listdir("/proc/self/fd"))
+    watcher = watch.get_watcher(NotebookDiscovery(str(tmp_path)))
+
+    assert isinstance(watcher, watch.PollingWatcher)
+    assert set(os.listdir("/proc/self/fd")) <= fds